@@ -0,0 +1,40 @@
+# Scalar functions mapped over N elements vs. their batch versions.
+#   python src/benchmark.py [N]
+import sys
+import time
+import numpy as np
+from calculator import add, add_batch
+from utils import multiply, division, multiply_batch, division_batch
+
+N = 10_000_000
+ZERO_RATE = 0.01  # share of zero divisors
+
+def timed(fn):
+	t0 = time.perf_counter()
+	result = fn()
+	return result, time.perf_counter() - t0
+
+def main(n=N):
+	rng = np.random.default_rng(0)
+	a = rng.random(n) * 100
+	b = rng.integers(1, 50, n).astype(np.float64)
+	b[rng.random(n) < ZERO_RATE] = 0
+	a_list, b_list = a.tolist(), b.tolist()
+
+	cases = [
+		("add", lambda: list(map(add, a_list, b_list)), lambda: add_batch(a, b)),
+		("multiply", lambda: list(map(multiply, a_list, b_list)), lambda: multiply_batch(a, b)),
+		("division", lambda: list(map(division, a_list, b_list)), lambda: division_batch(a, b)),
+	]
+	print(f"{n:,} elements")
+	print(f"{'function':<10} {'scalar map s':>13} {'batch s':>9} {'speedup':>9}")
+	for name, scalar, batch in cases:
+		scalar_result, scalar_s = timed(scalar)
+		batch_result, batch_s = timed(batch)
+		print(f"{name:<10} {scalar_s:>13.3f} {batch_s:>9.3f} {scalar_s / batch_s:>8.0f}x")
+		if name == "division":
+			invalid = sum(1 for x in scalar_result if x == "Invalid Input")
+			assert invalid == int(batch_result[1].sum())
+
+if __name__ == "__main__":
+	main(int(sys.argv[1]) if len(sys.argv) > 1 else N)
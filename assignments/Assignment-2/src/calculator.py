@@ -1,5 +1,12 @@
+import numpy as np
+
 def add(a, b):
 	return a+b
+
+def add_batch(a, b):
+	# element-wise over arrays / pandas Series (index kept), with broadcasting
+	return np.add(a, b)
 	
 if __name__ == "__main__":
 	print(add(5, 4))
+	print(add_batch([1, 2, 3], 10))
@@ -1,3 +1,5 @@
+import numpy as np
+
 def multiply(a, b):
 	return a*b
 
@@ -6,3 +8,29 @@ def division(a, b):
 		return "Invalid Input"
 	
 	return a/b
+
+def multiply_batch(a, b):
+	# element-wise over arrays / pandas Series (index kept), with broadcasting
+	return np.multiply(a, b)
+
+def _zero_mask(b, like):
+	# True where b == 0, broadcast to the shape (and for a Series, the index) of like
+	zero = np.equal(b, 0)
+	index = getattr(like, "index", None)
+	if index is not None:
+		if getattr(zero, "index", None) is not None:
+			return zero.reindex(index, fill_value=False)
+		return like.__class__(np.broadcast_to(zero, like.shape), index=index)
+	return np.broadcast_to(zero, np.shape(like)).copy()
+
+def division_batch(a, b):
+	# Vectorised division: returns (result, error). Wherever b == 0 the result is
+	# NaN and error is True, so the result stays a float column instead of mixing
+	# in "Invalid Input" strings. np.ma.masked_array(result, error) if masked
+	# values are preferred over NaN.
+	with np.errstate(divide="ignore", invalid="ignore"):
+		result = np.true_divide(a, b)
+	error = _zero_mask(b, result)
+	if getattr(result, "index", None) is not None:
+		return result.mask(error), error
+	return np.where(error, np.nan, result), error
@@ -2,162 +2,387 @@
 import sqlite3
 import time
 import random
-import pandas as pd
-import numpy as np
-from pymongo import MongoClient
+from pymongo import ReturnDocument
 from mongo_helpers import get_mongo_client
-import statistics
-import json
-import os
+from mongo_indexes import ensure_indexes, verify_query_plans
+from sqlite_dao import SQLiteDAO
+from Q1 import create_secondary_indexes
+from read_cache import ReadThroughCache, TTL
+import typed_schema
+from key_sampling import DISTRIBUTIONS, cached_keys, sqlite_sample, mongo_sample
+from analytics import (
+    DIMENSIONS, SUMMARY_COLLECTIONS, summary_deltas, apply_summary_deltas,
+    sqlite_revenue, mongo_tx_revenue, mongo_cc_revenue, sqlite_summary, mongo_summary,
+    install_sqlite_summaries, rebuild_mongo_summaries, drop_sqlite_summaries, drop_mongo_summaries,
+)
+from bench_harness import measure, summarize, write_results, print_summary
+from instrumentation import RECORDER, COMMANDS_CSV, MongoCommandRecorder, instrument_sqlite, print_report
 
 # CONFIG
 SQLITE_DB = "online_retail.db"  # the DB your assignment Q1 script created
 MONGO_URI = None  # set to your Atlas URI string or None for localhost
-NUM_ITER = 100  # number of operations per test (lower if slow)
+NUM_ITER = 100  # measured operations per test (lower if slow)
+WARMUP = 10  # unmeasured operations run before each test
 SEED = 42
+KEY_DISTRIBUTION = "uniform"  # uniform | zipf (hot keys) | cold, see key_sampling
+BENCH_PREFIX = "NEW_"  # every row/document the benchmark writes starts with this
+ANALYTICS_ITER = 5  # measured runs of each aggregate query
+MAINTAIN_SUMMARIES = False  # keep revenue summaries up to date on benchmark writes
+CACHE_BYTES = 0  # >0: also benchmark the hot reads through a read-through cache of this size
+READ_CACHE = None  # set by run_benchmarks while the cached reads and the writes run
+DATE_RANGE_ITER = 20  # measured [start, start + typed_schema.DATE_RANGE_DAYS) queries per system
 random.seed(SEED)
 
 def sqlite_connect():
     return sqlite3.connect(SQLITE_DB)
 
-def sqlite_get_random_invoice_numbers(conn, k):
-    cur = conn.cursor()
-    cur.execute("SELECT InvoiceNo FROM Invoice")
-    all_ids = [row[0] for row in cur.fetchall()]
-    return random.sample(all_ids, min(k, len(all_ids)))
-
-def mongo_get_random_invoice_ids(db, k, coll_name):
-    coll = db[coll_name]
-    # aggregate to sample k ids
-    ids = [doc['_id'] for doc in coll.find({}, {'_id': 1}).limit(10000)]
-    return random.sample(ids, min(k, len(ids)))
-
-def time_func(func, *a, **kw):
-    t0 = time.perf_counter()
-    func(*a, **kw)
-    return time.perf_counter() - t0
-
-def bench_sqlite_read_invoice(conn, invoice_no):
-    cur = conn.cursor()
+def sqlite_dao():
+    return SQLiteDAO(SQLITE_DB)
+
+# Benchmark keys are sampled on the server and cached under key_sampling.CACHE_DIR,
+# so repeated runs with the same seed/distribution replay the same workload.
+def sqlite_get_random_invoice_numbers(conn, k, distribution=KEY_DISTRIBUTION, seed=SEED, refresh=False):
+    return cached_keys("sqlite_invoices", k, distribution, seed,
+                       lambda n, rng: sqlite_sample(conn, "Invoice", "InvoiceNo", n, rng), refresh=refresh)
+
+def sqlite_get_random_customer_ids(conn, k, distribution=KEY_DISTRIBUTION, seed=SEED, refresh=False):
+    return cached_keys("sqlite_customers", k, distribution, seed,
+                       lambda n, rng: sqlite_sample(conn, "Customer", "CustomerID", n, rng), refresh=refresh)
+
+def mongo_get_random_invoice_ids(db, k, coll_name, distribution=KEY_DISTRIBUTION, seed=SEED, refresh=False):
+    return cached_keys(f"mongo_{coll_name}", k, distribution, seed,
+                       lambda n, rng: mongo_sample(db[coll_name], n), refresh=refresh)
+
+def mongo_get_random_customer_ids(db, k, distribution=KEY_DISTRIBUTION, seed=SEED, refresh=False):
+    return mongo_get_random_invoice_ids(db, k, "customers_cc", distribution, seed, refresh)
+
+def bench_sqlite_read_invoice(dao, invoice_no):
     # join invoice and invoice items
-    cur.execute("SELECT Invoice.InvoiceNo, Invoice.InvoiceDate, Invoice.CustomerID, InvoiceItem.StockCode, InvoiceItem.Quantity, InvoiceItem.UnitPrice FROM Invoice LEFT JOIN InvoiceItem ON Invoice.InvoiceNo = InvoiceItem.InvoiceNo WHERE Invoice.InvoiceNo = ?", (invoice_no,))
-    _ = cur.fetchall()
+    dao.read_invoice(invoice_no)
+
+def bench_sqlite_read_customer(dao, customer_id):
+    # customer with all invoices and items (counterpart of bench_mongo_read_customer_centric)
+    dao.read_customer(customer_id)
 
-def bench_sqlite_insert(conn, invoice_no):
-    cur = conn.cursor()
+def bench_sqlite_insert(dao, invoice_no):
     # simple insert: insert invoice and one sample item (make sure keys don't collide)
-    cur.execute("INSERT OR IGNORE INTO Invoice (InvoiceNo, InvoiceDate, CustomerID) VALUES (?, datetime('now'), '0')", (invoice_no,))
-    cur.execute("INSERT OR IGNORE INTO InvoiceItem (InvoiceNo, StockCode, Quantity, UnitPrice) VALUES (?, 'SAMPLE', 1, 1.0)", (invoice_no,))
-    conn.commit()
+    dao.insert_invoice(invoice_no)
 
-def bench_sqlite_update(conn, invoice_no):
-    cur = conn.cursor()
-    cur.execute("UPDATE InvoiceItem SET Quantity = Quantity + 1 WHERE InvoiceNo = ?", (invoice_no,))
-    conn.commit()
+def bench_sqlite_update(dao, invoice_no):
+    dao.update_items(invoice_no)
 
-def bench_sqlite_delete(conn, invoice_no):
-    cur = conn.cursor()
-    cur.execute("DELETE FROM InvoiceItem WHERE InvoiceNo = ?", (invoice_no,))
-    cur.execute("DELETE FROM Invoice WHERE InvoiceNo = ?", (invoice_no,))
-    conn.commit()
+def bench_sqlite_delete(dao, invoice_no):
+    dao.delete_invoice(invoice_no)
 
 # Mongo equivalents (transactional and customer-centric)
+# With MAINTAIN_SUMMARIES the write paths also adjust the revenue summary
+# collections (analytics.SUMMARY_COLLECTIONS); transactional writes do it inside
+# their transaction, the customer-centric ones right after the write.
+def _tx_summary_update(db, invoice_no, items, sign, session=None):
+    header = db.invoices.find_one({"_id": invoice_no}, {"customerId": 1, "invoiceDate": 1}, session=session) or {}
+    customer = db.customers.find_one({"_id": header.get("customerId")}, {"country": 1}, session=session) or {}
+    deltas = summary_deltas(header.get("customerId"), customer.get("country"), header.get("invoiceDate"), items, sign)
+    apply_summary_deltas(db[SUMMARY_COLLECTIONS["mongo_tx"]], deltas, session=session)
+
+def _cc_summary_update(db, customer_id, country, invoice_doc, items, sign):
+    deltas = summary_deltas(customer_id, country, invoice_doc.get("invoiceDate"), items, sign)
+    apply_summary_deltas(db[SUMMARY_COLLECTIONS["mongo_cc"]], deltas)
+
+def _item_tuples(items):
+    return [(it["stockCode"], it["quantity"], it["unitPrice"]) for it in items]
+
+# With READ_CACHE set, the invoice and customer reads go through it and every
+# write below invalidates the invoice / customer it touched once it is done.
+def _invalidate(*key):
+    if READ_CACHE is not None:
+        READ_CACHE.invalidate(key)
+
 def bench_mongo_read_invoice_transactional(db, invoice_no):
-    inv = db.invoices.find_one({"_id": invoice_no})
-    items = list(db.invoice_items.find({"invoiceNo": invoice_no}))
-    return
+    def load():
+        inv = db.invoices.find_one({"_id": invoice_no})
+        items = list(db.invoice_items.find({"invoiceNo": invoice_no}))
+        return inv, items
+    if READ_CACHE is None:
+        return load()
+    return READ_CACHE.get_or_load(("mongo_tx", "invoice", invoice_no), load)
 
 def bench_mongo_insert_transactional(client, db, invoice_no):
     with client.start_session() as session:
         with session.start_transaction():
-            db.invoices.insert_one({"_id": invoice_no, "invoiceDate": "now", "customerId": "0"}, session=session)
+            db.invoices.insert_one({"_id": invoice_no, "invoiceDate": time.strftime(typed_schema.DATE_FORMAT), "customerId": "0"}, session=session)
             db.invoice_items.insert_one({"invoiceNo": invoice_no, "stockCode": "SAMPLE", "quantity": 1, "unitPrice": 1.0}, session=session)
+            if MAINTAIN_SUMMARIES:
+                _tx_summary_update(db, invoice_no, [("SAMPLE", 1, 1.0)], 1, session=session)
+    _invalidate("mongo_tx", "invoice", invoice_no)
 
-def bench_mongo_update_transactional(db, invoice_no):
-    db.invoice_items.update_one({"invoiceNo": invoice_no}, {"$inc": {"quantity": 1}})
+def bench_mongo_update_transactional(client, db, invoice_no):
+    if not MAINTAIN_SUMMARIES:
+        db.invoice_items.update_one({"invoiceNo": invoice_no}, {"$inc": {"quantity": 1}})
+    else:
+        with client.start_session() as session:
+            with session.start_transaction():
+                item = db.invoice_items.find_one_and_update({"invoiceNo": invoice_no}, {"$inc": {"quantity": 1}},
+                                                            projection={"stockCode": 1, "unitPrice": 1}, session=session)
+                if item:
+                    _tx_summary_update(db, invoice_no, [(item["stockCode"], 1, item["unitPrice"])], 1, session=session)
+    _invalidate("mongo_tx", "invoice", invoice_no)
 
 def bench_mongo_delete_transactional(client, db, invoice_no):
     with client.start_session() as session:
         with session.start_transaction():
+            if MAINTAIN_SUMMARIES:
+                items = list(db.invoice_items.find({"invoiceNo": invoice_no}, session=session))
+                _tx_summary_update(db, invoice_no, _item_tuples(items), -1, session=session)
             db.invoice_items.delete_many({"invoiceNo": invoice_no}, session=session)
             db.invoices.delete_one({"_id": invoice_no}, session=session)
+    _invalidate("mongo_tx", "invoice", invoice_no)
 
 def bench_mongo_read_customer_centric(db, customer_id):
-    doc = db.customers_cc.find_one({"_id": customer_id})
-    return
+    if READ_CACHE is None:
+        return db.customers_cc.find_one({"_id": customer_id})
+    return READ_CACHE.get_or_load(("mongo_cc", "customer", customer_id),
+                                  lambda: db.customers_cc.find_one({"_id": customer_id}))
 
 def bench_mongo_insert_customer_centric(db, customer_id, invoice_no):
-    invoice_doc = {"invoiceNo": invoice_no, "invoiceDate": "now", "items": [{"stockCode": "SAMPLE", "quantity": 1, "unitPrice": 1.0}]}
-    db.customers_cc.update_one({"_id": customer_id}, {"$setOnInsert": {"country": "XX"}, "$push": {"invoices": invoice_doc}}, upsert=True)
+    invoice_doc = {"invoiceNo": invoice_no, "invoiceDate": time.strftime(typed_schema.DATE_FORMAT), "items": [{"stockCode": "SAMPLE", "quantity": 1, "unitPrice": 1.0}]}
+    if not MAINTAIN_SUMMARIES:
+        db.customers_cc.update_one({"_id": customer_id}, {"$setOnInsert": {"country": "XX"}, "$push": {"invoices": invoice_doc}}, upsert=True)
+    else:
+        doc = db.customers_cc.find_one_and_update({"_id": customer_id}, {"$setOnInsert": {"country": "XX"}, "$push": {"invoices": invoice_doc}},
+                                                  projection={"country": 1}, upsert=True, return_document=ReturnDocument.AFTER)
+        _cc_summary_update(db, customer_id, doc.get("country"), invoice_doc, _item_tuples(invoice_doc["items"]), 1)
+    _invalidate("mongo_cc", "customer", customer_id)
 
 def bench_mongo_update_customer_centric(db, customer_id):
     # increment quantity of first item in first invoice (if exists)
-    db.customers_cc.update_one({"_id": customer_id}, {"$inc": {"invoices.0.items.0.quantity": 1}})
+    if not MAINTAIN_SUMMARIES:
+        db.customers_cc.update_one({"_id": customer_id}, {"$inc": {"invoices.0.items.0.quantity": 1}})
+    else:
+        doc = db.customers_cc.find_one_and_update({"_id": customer_id}, {"$inc": {"invoices.0.items.0.quantity": 1}},
+                                                  projection={"country": 1, "invoices": {"$slice": 1}})
+        if doc and doc.get("invoices") and doc["invoices"][0].get("items"):
+            item = doc["invoices"][0]["items"][0]
+            _cc_summary_update(db, customer_id, doc.get("country"), doc["invoices"][0], [(item["stockCode"], 1, item["unitPrice"])], 1)
+    _invalidate("mongo_cc", "customer", customer_id)
 
 def bench_mongo_delete_customer_centric(db, customer_id, invoice_no):
-    db.customers_cc.update_one({"_id": customer_id}, {"$pull": {"invoices": {"invoiceNo": invoice_no}}})
+    if not MAINTAIN_SUMMARIES:
+        db.customers_cc.update_one({"_id": customer_id}, {"$pull": {"invoices": {"invoiceNo": invoice_no}}})
+    else:
+        # the pre-image's matching invoice tells us what revenue to take back out
+        doc = db.customers_cc.find_one_and_update({"_id": customer_id}, {"$pull": {"invoices": {"invoiceNo": invoice_no}}},
+                                                  projection={"country": 1, "invoices": {"$elemMatch": {"invoiceNo": invoice_no}}})
+        if doc and doc.get("invoices"):
+            invoice_doc = doc["invoices"][0]
+            _cc_summary_update(db, customer_id, doc.get("country"), invoice_doc, _item_tuples(invoice_doc["items"]), -1)
+    _invalidate("mongo_cc", "customer", customer_id)
+
+def cleanup_benchmark_rows(sql_conn, mdb):
+    """
+    Remove everything earlier (possibly aborted) runs inserted, so runs start from
+    the same state. Either side may be None to leave that system untouched.
+    """
+    if sql_conn is not None:
+        sql_conn.execute("DELETE FROM InvoiceItem WHERE InvoiceNo LIKE ?", (BENCH_PREFIX + "%",))
+        sql_conn.execute("DELETE FROM Invoice WHERE InvoiceNo LIKE ?", (BENCH_PREFIX + "%",))
+        sql_conn.commit()
+    if mdb is None:
+        return
+    prefix = {"$regex": "^" + BENCH_PREFIX}
+    mdb.invoice_items.delete_many({"invoiceNo": prefix})
+    mdb.invoices.delete_many({"_id": prefix})
+    mdb.customers_cc.delete_many({"_id": prefix})
+    for coll_name in SUMMARY_COLLECTIONS.values():
+        mdb[coll_name].delete_many({"key": prefix})
+
+def _fresh_keys(sample, *args, **kwargs):
+    """Sampled keys; resampled if the cached set predates a cleanup and holds BENCH_PREFIX rows."""
+    keys = sample(*args, **kwargs)
+    if any(str(k).startswith(BENCH_PREFIX) for k in keys):
+        keys = sample(*args, **dict(kwargs, refresh=True))
+    return keys
+
+def new_ids(label, seed, n):
+    """Deterministic ids for inserted rows, e.g. NEW_SQL_42_7 (no wall-clock component)."""
+    return [f"{BENCH_PREFIX}{label}_{seed}_{i}" for i in range(n)]
 
-def run_benchmarks():
+def split_warmup(items, warmup):
+    """Warmup args are taken cyclically from the sampled keys; all keys are measured."""
+    if not items:
+        return [], []
+    return [items[i % len(items)] for i in range(warmup)], items
+
+def run_benchmarks(iterations=NUM_ITER, warmup=WARMUP, seed=SEED, distribution=KEY_DISTRIBUTION, refresh_keys=False,
+                   summaries=MAINTAIN_SUMMARIES, cache_bytes=CACHE_BYTES, cache_ttl=TTL, client=None, typed=False):
+    global MAINTAIN_SUMMARIES, READ_CACHE
+    MAINTAIN_SUMMARIES = summaries
+    random.seed(seed)
     results = []
+    keys = {"distribution": distribution, "seed": seed, "refresh": refresh_keys}
     # SQLite setup
-    sql_conn = sqlite_connect()
-    sql_invoice_ids = sqlite_get_random_invoice_numbers(sql_conn, NUM_ITER)
+    dao = sqlite_dao()
+    create_secondary_indexes(dao.conn)  # a DB built by an older Q1 gets the current indexes too
+    sql_conn = instrument_sqlite(dao.conn)
+    # opened up front so a missing typed load fails before anything is measured
+    typed_conn = typed_schema.connect_sqlite() if typed else None
     # Mongo setup
-    mongo_client = get_mongo_client(MONGO_URI)
+    # command listener: round trips, driver-side command time and BSON sizes per measured operation
+    RECORDER.reset()
+    own_client = client is None
+    if own_client:
+        mongo_client = get_mongo_client(MONGO_URI, event_listeners=[MongoCommandRecorder(sizes=True)])
+    else:
+        # shared client (cli.py bench): its owner registers the MongoCommandRecorder
+        mongo_client = client
     mdb = mongo_client["online_retail"]
-    mongo_invoice_ids = mongo_get_random_invoice_ids(mdb, NUM_ITER, "invoices")
-    mongo_customer_ids = [doc["_id"] for doc in mdb.customers_cc.find({}, {"_id": 1}).limit(NUM_ITER)]
-
-    # READ SQLite
-    for inv in sql_invoice_ids:
-        t = time_func(bench_sqlite_read_invoice, sql_conn, inv)
-        results.append({"system": "sqlite", "operation": "read_invoice", "time": t})
-    # READ Mongo transactional
-    for inv in mongo_invoice_ids:
-        t = time_func(bench_mongo_read_invoice_transactional, mdb, inv)
-        results.append({"system": "mongo_tx", "operation": "read_invoice", "time": t})
-    # READ Mongo customer-centric
-    for cid in mongo_customer_ids:
-        t = time_func(bench_mongo_read_customer_centric, mdb, cid)
-        results.append({"system": "mongo_cc", "operation": "read_customer", "time": t})
-
-    # INSERT tests (use unique ids)
-    for i in range(10):
-        new_inv = f"NEW_SQL_{i}_{int(time.time()*1000)}"
-        t = time_func(bench_sqlite_insert, sql_conn, new_inv)
-        results.append({"system": "sqlite", "operation": "insert_invoice", "time": t})
-    for i in range(10):
-        new_inv = f"NEW_MTX_{i}_{int(time.time()*1000)}"
-        t = time_func(bench_mongo_insert_transactional, mongo_client, mdb, new_inv)
-        results.append({"system": "mongo_tx", "operation": "insert_invoice", "time": t})
-    for i in range(10):
-        cust = f"NEW_CUST_{i}_{int(time.time()*1000)}"
-        inv = f"NEW_CC_{i}_{int(time.time()*1000)}"
-        t = time_func(bench_mongo_insert_customer_centric, mdb, cust, inv)
-        results.append({"system": "mongo_cc", "operation": "insert_invoice", "time": t})
-
-    # small updates
-    for inv in sql_invoice_ids[:20]:
-        t = time_func(bench_sqlite_update, sql_conn, inv)
-        results.append({"system": "sqlite", "operation": "update_item", "time": t})
-    for inv in mongo_invoice_ids[:20]:
-        t = time_func(bench_mongo_update_transactional, mdb, inv)
-        results.append({"system": "mongo_tx", "operation": "update_item", "time": t})
-    for cid in mongo_customer_ids[:20]:
-        t = time_func(bench_mongo_update_customer_centric, mdb, cid)
-        results.append({"system": "mongo_cc", "operation": "update_item", "time": t})
-
-    # deletes
-    # clean those NEW_* inserted earlier - skip for brevity
+    # clean up before sampling, so leftovers of an aborted run cannot become measured keys
+    cleanup_benchmark_rows(sql_conn, mdb)
+    sql_invoice_ids = _fresh_keys(sqlite_get_random_invoice_numbers, sql_conn, iterations, **keys)
+    sql_customer_ids = _fresh_keys(sqlite_get_random_customer_ids, sql_conn, iterations, **keys)
+    mongo_invoice_ids = _fresh_keys(mongo_get_random_invoice_ids, mdb, iterations, "invoices", **keys)
+    mongo_customer_ids = _fresh_keys(mongo_get_random_customer_ids, mdb, iterations, **keys)
+    index_timings = ensure_indexes(mdb)
+    if mongo_invoice_ids and mongo_customer_ids:
+        verify_query_plans(mdb, mongo_invoice_ids[0], mongo_customer_ids[0])
+    sqlite_plans = {}
+    if sql_invoice_ids and sql_customer_ids:
+        sqlite_plans = dao.explain_all(sql_invoice_ids[0], sql_customer_ids[0])
+        for name, plan in sqlite_plans.items():
+            print(f"EXPLAIN QUERY PLAN {name}: {'; '.join(plan)}")
+    if summaries:
+        # full rebuild once; the CRUD writes below keep them current
+        install_sqlite_summaries(sql_conn)
+        rebuild_mongo_summaries(mdb)
+    else:
+        # triggers left behind by an aborted --summaries run would tax the writes
+        drop_sqlite_summaries(sql_conn)
+
+    def run(system, operation, func, args):
+        warm, measured = split_warmup(args, warmup)
+        results.extend(measure(system, operation, func, measured, warm))
+
+    # READ
+    run("sqlite", "read_invoice", bench_sqlite_read_invoice, [(dao, inv) for inv in sql_invoice_ids])
+    run("sqlite", "read_customer", bench_sqlite_read_customer, [(dao, cid) for cid in sql_customer_ids])
+    run("mongo_tx", "read_invoice", bench_mongo_read_invoice_transactional, [(mdb, inv) for inv in mongo_invoice_ids])
+    run("mongo_cc", "read_customer", bench_mongo_read_customer_centric, [(mdb, cid) for cid in mongo_customer_ids])
+
+    # the same reads through the read-through cache; it stays on for the writes
+    # below, which invalidate what they touch
+    cache_stats = None
+    if cache_bytes:
+        READ_CACHE = ReadThroughCache(cache_bytes, cache_ttl)
+        dao.cache = READ_CACHE
+        run("sqlite", "read_invoice_cached", bench_sqlite_read_invoice, [(dao, inv) for inv in sql_invoice_ids])
+        run("mongo_tx", "read_invoice_cached", bench_mongo_read_invoice_transactional, [(mdb, inv) for inv in mongo_invoice_ids])
+        run("mongo_cc", "read_customer_cached", bench_mongo_read_customer_centric, [(mdb, cid) for cid in mongo_customer_ids])
+        cache_stats = READ_CACHE.stats()
+        for namespace, lookups in cache_stats["lookups"].items():
+            print(f"read cache {namespace}: {lookups['hits']} hits / {lookups['misses']} misses ({lookups['hit_rate']:.1%})")
+
+    # UPDATE
+    run("sqlite", "update_item", bench_sqlite_update, [(dao, inv) for inv in sql_invoice_ids])
+    run("mongo_tx", "update_item", bench_mongo_update_transactional, [(mongo_client, mdb, inv) for inv in mongo_invoice_ids])
+    run("mongo_cc", "update_item", bench_mongo_update_customer_centric, [(mdb, cid) for cid in mongo_customer_ids])
+
+    # INSERT then DELETE the same (deterministic) ids; warmup uses its own ids and is deleted in warmup too
+    sql_warm, sql_new = new_ids("SQLW", seed, warmup), new_ids("SQL", seed, iterations)
+    mtx_warm, mtx_new = new_ids("MTXW", seed, warmup), new_ids("MTX", seed, iterations)
+    cc_warm = list(zip(new_ids("CUSTW", seed, warmup), new_ids("CCW", seed, warmup)))
+    cc_new = list(zip(new_ids("CUST", seed, iterations), new_ids("CC", seed, iterations)))
+
+    results.extend(measure("sqlite", "insert_invoice", bench_sqlite_insert,
+                           [(dao, inv) for inv in sql_new], [(dao, inv) for inv in sql_warm]))
+    results.extend(measure("mongo_tx", "insert_invoice", bench_mongo_insert_transactional,
+                           [(mongo_client, mdb, inv) for inv in mtx_new], [(mongo_client, mdb, inv) for inv in mtx_warm]))
+    results.extend(measure("mongo_cc", "insert_invoice", bench_mongo_insert_customer_centric,
+                           [(mdb, cust, inv) for cust, inv in cc_new], [(mdb, cust, inv) for cust, inv in cc_warm]))
+
+    results.extend(measure("sqlite", "delete_invoice", bench_sqlite_delete,
+                           [(dao, inv) for inv in sql_new], [(dao, inv) for inv in sql_warm]))
+    results.extend(measure("mongo_tx", "delete_invoice", bench_mongo_delete_transactional,
+                           [(mongo_client, mdb, inv) for inv in mtx_new], [(mongo_client, mdb, inv) for inv in mtx_warm]))
+    results.extend(measure("mongo_cc", "delete_invoice", bench_mongo_delete_customer_centric,
+                           [(mdb, cust, inv) for cust, inv in cc_new], [(mdb, cust, inv) for cust, inv in cc_warm]))
+
+    # deleting an embedded invoice leaves the (now empty) NEW_CUST_* documents behind
+    cleanup_benchmark_rows(sql_conn, mdb)
+    if READ_CACHE is not None:
+        cache_stats["after_writes"] = READ_CACHE.stats()
+        READ_CACHE = dao.cache = None
+
+    # DATE RANGE: the string layout rebuilds a date per row; with --typed the typed
+    # layout (typed_schema load-sqlite / load-mongo) answers from a date index
+    windows = typed_schema.date_windows(DATE_RANGE_ITER + 1, seed)
+    warm_window, windows = windows[:1], windows[1:]
+    date_range_runs = [("sqlite", typed_schema.sqlite_date_range, sql_conn, False),
+                       ("mongo_tx", typed_schema.mongo_date_range, mdb, False)]
+    if typed:
+        date_range_runs += [("sqlite_typed", typed_schema.sqlite_date_range, typed_conn, True),
+                            ("mongo_tx_typed", typed_schema.mongo_date_range, mongo_client[typed_schema.TYPED_MONGO_DB], True)]
+    for system, func, target, is_typed in date_range_runs:
+        results.extend(measure(system, "date_range", func, [(target, a, b, is_typed) for a, b in windows],
+                               [(target, a, b, is_typed) for a, b in warm_window]))
+
+    # ANALYTICS: full-scan aggregates vs reading the incrementally maintained summaries
+    for dim in DIMENSIONS:
+        op = f"revenue_by_{dim}"
+        results.extend(measure("sqlite", op, sqlite_revenue, [(sql_conn, dim)] * ANALYTICS_ITER, [(sql_conn, dim)]))
+        results.extend(measure("mongo_tx", op, mongo_tx_revenue, [(mdb, dim)] * ANALYTICS_ITER, [(mdb, dim)]))
+        results.extend(measure("mongo_cc", op, mongo_cc_revenue, [(mdb, dim)] * ANALYTICS_ITER, [(mdb, dim)]))
+        if summaries:
+            op = f"summary_by_{dim}"
+            results.extend(measure("sqlite", op, sqlite_summary, [(sql_conn, dim)] * ANALYTICS_ITER, [(sql_conn, dim)]))
+            for system in ("mongo_tx", "mongo_cc"):
+                results.extend(measure(system, op, mongo_summary, [(mdb, system, dim)] * ANALYTICS_ITER, [(mdb, system, dim)]))
+    if summaries:
+        # benchmark-scoped: later loads into the same databases must not pay for the triggers
+        drop_sqlite_summaries(sql_conn)
+        drop_mongo_summaries(mdb)
 
     # Save results
-    df = pd.DataFrame(results)
-    fname = "benchmark_results.csv"
-    df.to_csv(fname, index=False)
-    print(f"Saved {len(df)} rows to {fname}")
-    sql_conn.close()
-    mongo_client.close()
+    summary = summarize(results)
+    print_summary(summary)
+    config = {
+        "iterations": iterations,
+        "warmup": warmup,
+        "seed": seed,
+        "key_distribution": distribution,
+        "summaries": summaries,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "mongo_index_build": index_timings,
+        "sqlite_query_plans": sqlite_plans,
+        "commands_csv": COMMANDS_CSV,
+        "read_cache": {"max_bytes": cache_bytes, "ttl": cache_ttl, "stats": cache_stats} if cache_bytes else None,
+        "date_range_days": typed_schema.DATE_RANGE_DAYS,
+    }
+    if typed:
+        typed_conn.close()
+        config["storage"] = typed_schema.storage_report(mongo_client, SQLITE_DB, typed_schema.TYPED_DB_NAME)
+        typed_schema.print_storage_report(config["storage"])
+    write_results(results, summary, config)
+    print_report(RECORDER.write(COMMANDS_CSV))
+    dao.close()
+    if own_client:
+        mongo_client.close()
 
-if __name__ == "__main__":
-    run_benchmarks()
+def main(argv=None, client=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="CRUD benchmark: SQLite vs MongoDB (transactional / customer-centric)")
+    parser.add_argument("--iterations", type=int, default=NUM_ITER)
+    parser.add_argument("--warmup", type=int, default=WARMUP)
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--distribution", choices=DISTRIBUTIONS, default=KEY_DISTRIBUTION)
+    parser.add_argument("--refresh-keys", action="store_true", help="resample instead of reusing cached key sets")
+    parser.add_argument("--summaries", action="store_true", help="maintain and benchmark incremental revenue summaries")
+    parser.add_argument("--cache-mb", type=float, default=CACHE_BYTES / 2**20,
+                        help="also benchmark the hot reads through a read-through cache of this many MB")
+    parser.add_argument("--cache-ttl", type=float, default=TTL, help="read cache entry lifetime in seconds")
+    parser.add_argument("--typed", action="store_true",
+                        help="also query the typed layout and report storage size / ingest memory of both layouts")
+    args = parser.parse_args(argv)
+    run_benchmarks(args.iterations, args.warmup, args.seed, args.distribution, args.refresh_keys, args.summaries,
+                   int(args.cache_mb * 2**20), args.cache_ttl, client, args.typed)
 
+if __name__ == "__main__":
+    main()
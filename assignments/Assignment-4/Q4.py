@@ -1,17 +1,26 @@
+# Writes config/atlas_config.json describing the MongoDB deployment.
+#
+#   python Q4.py [--output PATH]      or      python cli.py config [--output PATH]
+#
+# Both connect to MONGO_URI, or to mongodb://localhost:27017 when it is unset
+# (run standalone, Q4 used to refuse to start without MONGO_URI). A server that
+# cannot be reached fails at server_info() after the 5 s selection timeout.
+# pymongo is imported only when Q4 opens its own client, as cli.py does.
 import json
 import os
-from pymongo import MongoClient
 
-def create_config_file(output_path="config/atlas_config.json"):
+def create_config_file(output_path="config/atlas_config.json", client=None):
     """
     Connects to MongoDB (Atlas or local), inspects server info,
     and writes a JSON config file describing the cluster + schema.
+    A passed-in ``client`` (e.g. the CLI's shared one) is used and left open.
+    Without MONGO_URI both entry points use the local server, like the loaders.
     """
-    uri = os.environ.get("MONGO_URI")
-    if not uri:
-        raise RuntimeError("MONGO_URI not set. Please export it before running.")
-
-    client = MongoClient(uri, serverSelectionTimeoutMS=5000)
+    own_client = client is None
+    if own_client:
+        from mongo_helpers import get_mongo_client
+        # server_info() below is the first round trip, so no separate ping
+        client = get_mongo_client(os.environ.get("MONGO_URI"), ping=False)
 
     # get cluster/server info
     server_info = client.server_info()
@@ -44,9 +53,18 @@ def create_config_file(output_path="config/atlas_config.json"):
         json.dump(config, f, indent=4)
 
     print(f"Config file written to {output_path}")
-    client.close()
+    if own_client:
+        client.close()
+
+
+def main(argv=None, client=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="Write a JSON description of the MongoDB deployment")
+    parser.add_argument("--output", default="config/atlas_config.json")
+    args = parser.parse_args(argv)
+    create_config_file(args.output, client)
 
 
 if __name__ == "__main__":
-    create_config_file()
+    main()
 
@@ -0,0 +1,205 @@
+from pymongo import UpdateOne
+
+DIMENSIONS = ["customer", "country", "product", "month"]
+SUMMARY_TABLE = "RevenueSummary"
+SUMMARY_COLLECTIONS = {"mongo_tx": "revenue_summary_tx", "mongo_cc": "revenue_summary_cc"}
+
+# --- month bucketing -----------------------------------------------------------
+# InvoiceDate is "M/D/YYYY H:MM" (typed_schema.DATE_FORMAT) everywhere: in the CSV
+# and in the rows the benchmark inserts, in both systems. It maps to "YYYY-MM".
+
+def month_key(invoice_date):
+    if not isinstance(invoice_date, str):
+        return None
+    parts = invoice_date.split("/")
+    if len(parts) != 3:
+        return None
+    return f"{parts[2][:4]}-{int(parts[0]):02d}"
+
+def _sql_month(d):
+    return (
+        f"CASE WHEN instr({d}, '/') > 0 THEN substr({d}, instr({d}, '/') + instr(substr({d}, instr({d}, '/') + 1), '/') + 1, 4)"
+        f" || '-' || printf('%02d', CAST(substr({d}, 1, instr({d}, '/') - 1) AS INTEGER)) END"
+    )
+
+def _mongo_month(field):
+    parts = {"$split": [field, "/"]}
+    month = {"$arrayElemAt": ["$$p", 0]}
+    return {"$let": {"vars": {"p": parts}, "in": {"$cond": [
+        {"$eq": [{"$size": "$$p"}, 3]},
+        {"$concat": [
+            {"$substrCP": [{"$arrayElemAt": ["$$p", 2]}, 0, 4]}, "-",
+            {"$cond": [{"$eq": [{"$strLenCP": month}, 1]}, {"$concat": ["0", month]}, month]},
+        ]},
+        None,
+    ]}}}
+
+# --- full-scan queries -----------------------------------------------------------
+
+ITEM_REVENUE_SQL = "SUM(ii.Quantity * ii.UnitPrice) AS Revenue"
+SQL_QUERIES = {  # every query returns (Key, Revenue)
+    "customer": f"SELECT i.CustomerID AS Key, {ITEM_REVENUE_SQL} FROM InvoiceItem ii JOIN Invoice i ON i.InvoiceNo = ii.InvoiceNo GROUP BY Key",
+    "country": (
+        f"SELECT c.Country AS Key, {ITEM_REVENUE_SQL} FROM InvoiceItem ii JOIN Invoice i ON i.InvoiceNo = ii.InvoiceNo "
+        "JOIN Customer c ON c.CustomerID = i.CustomerID GROUP BY Key"
+    ),
+    "product": f"SELECT ii.StockCode AS Key, {ITEM_REVENUE_SQL} FROM InvoiceItem ii GROUP BY Key",
+    "month": (
+        f"SELECT {_sql_month('i.InvoiceDate')} AS Key, {ITEM_REVENUE_SQL} FROM InvoiceItem ii "
+        "JOIN Invoice i ON i.InvoiceNo = ii.InvoiceNo GROUP BY Key"
+    ),
+}
+
+_TX_REVENUE = {"$sum": {"$multiply": ["$quantity", "$unitPrice"]}}
+# revenue per invoice first, so $lookup runs once per invoice instead of per item
+_TX_BY_INVOICE = [
+    {"$group": {"_id": "$invoiceNo", "revenue": _TX_REVENUE}},
+    {"$lookup": {"from": "invoices", "localField": "_id", "foreignField": "_id", "as": "invoice"}},
+    {"$unwind": "$invoice"},
+]
+TX_PIPELINES = {  # run on invoice_items
+    "customer": _TX_BY_INVOICE + [{"$group": {"_id": "$invoice.customerId", "revenue": {"$sum": "$revenue"}}}],
+    "country": _TX_BY_INVOICE + [
+        {"$group": {"_id": "$invoice.customerId", "revenue": {"$sum": "$revenue"}}},
+        {"$lookup": {"from": "customers", "localField": "_id", "foreignField": "_id", "as": "customer"}},
+        {"$unwind": "$customer"},
+        {"$group": {"_id": "$customer.country", "revenue": {"$sum": "$revenue"}}},
+    ],
+    "product": [{"$group": {"_id": "$stockCode", "revenue": _TX_REVENUE}}],
+    "month": _TX_BY_INVOICE + [{"$group": {"_id": _mongo_month("$invoice.invoiceDate"), "revenue": {"$sum": "$revenue"}}}],
+}
+
+_CC_UNWIND = [{"$unwind": "$invoices"}, {"$unwind": "$invoices.items"}]
+_CC_REVENUE = {"$sum": {"$multiply": ["$invoices.items.quantity", "$invoices.items.unitPrice"]}}
+CC_PIPELINES = {  # run on customers_cc (embedded invoices only, not customers_cc_buckets)
+    "customer": [{"$project": {"invoices.items.quantity": 1, "invoices.items.unitPrice": 1}}] + _CC_UNWIND
+                + [{"$group": {"_id": "$_id", "revenue": _CC_REVENUE}}],
+    "country": _CC_UNWIND + [{"$group": {"_id": "$country", "revenue": _CC_REVENUE}}],
+    "product": _CC_UNWIND + [{"$group": {"_id": "$invoices.items.stockCode", "revenue": _CC_REVENUE}}],
+    "month": _CC_UNWIND + [{"$group": {"_id": _mongo_month("$invoices.invoiceDate"), "revenue": _CC_REVENUE}}],
+}
+
+def sqlite_revenue(conn, dim):
+    return conn.execute(SQL_QUERIES[dim]).fetchall()
+
+def mongo_tx_revenue(db, dim):
+    return [(d["_id"], d["revenue"]) for d in db.invoice_items.aggregate(TX_PIPELINES[dim], allowDiskUse=True)]
+
+def mongo_cc_revenue(db, dim):
+    return [(d["_id"], d["revenue"]) for d in db.customers_cc.aggregate(CC_PIPELINES[dim], allowDiskUse=True)]
+
+# --- summaries ---------------------------------------------------------------------
+# The summaries are scoped to one Q3 --summaries run: built from a full scan at
+# its start, kept current by the benchmark's writes (SQLite triggers, Mongo $inc
+# deltas in the write paths) and dropped again at its end. The loaders (Q1,
+# incremental, the Mongo loaders) do not maintain them and pay nothing for them;
+# whatever they loaded is picked up by the next run's rebuild.
+
+# --- SQLite summary table, maintained by triggers ----------------------------------
+
+SUMMARY_TRIGGERS = ("trg_summary_item_insert", "trg_summary_item_delete", "trg_summary_item_update")
+
+def _sql_summary_upserts(row, sign):
+    """Upserts adding sign * row's revenue to every dimension (row = NEW or OLD)."""
+    keys = {
+        "customer": f"(SELECT CustomerID FROM Invoice WHERE InvoiceNo = {row}.InvoiceNo)",
+        "country": (
+            "(SELECT Customer.Country FROM Invoice JOIN Customer ON Customer.CustomerID = Invoice.CustomerID "
+            f"WHERE Invoice.InvoiceNo = {row}.InvoiceNo)"
+        ),
+        "product": f"{row}.StockCode",
+        "month": f"(SELECT {_sql_month('InvoiceDate')} FROM Invoice WHERE InvoiceNo = {row}.InvoiceNo)",
+    }
+    return [
+        f"INSERT INTO {SUMMARY_TABLE} (Dim, Key, Revenue) "
+        f"SELECT '{dim}', k, {sign} * {row}.Quantity * {row}.UnitPrice FROM (SELECT {key} AS k) WHERE k IS NOT NULL "
+        "ON CONFLICT (Dim, Key) DO UPDATE SET Revenue = Revenue + excluded.Revenue;"
+        for dim, key in keys.items()
+    ]
+
+def install_sqlite_summaries(conn):
+    """
+    Create RevenueSummary(Dim, Key, Revenue), fill it from a full scan and add
+    InvoiceItem triggers so every later insert/update/delete adjusts it in place.
+    Items must reference an existing Invoice row when they are written (Q1 and the
+    benchmark both insert invoices first and delete items first). The triggers
+    tax every InvoiceItem write, so drop_sqlite_summaries removes them afterwards.
+    """
+    conn.execute(
+        f"CREATE TABLE IF NOT EXISTS {SUMMARY_TABLE} (Dim TEXT, Key TEXT, Revenue REAL, PRIMARY KEY (Dim, Key))"
+    )
+    triggers = {
+        "trg_summary_item_insert": ("AFTER INSERT ON InvoiceItem", _sql_summary_upserts("NEW", 1)),
+        "trg_summary_item_delete": ("AFTER DELETE ON InvoiceItem", _sql_summary_upserts("OLD", -1)),
+        "trg_summary_item_update": (
+            "AFTER UPDATE OF InvoiceNo, StockCode, Quantity, UnitPrice ON InvoiceItem",
+            _sql_summary_upserts("OLD", -1) + _sql_summary_upserts("NEW", 1),
+        ),
+    }
+    for name, (event, body) in triggers.items():
+        conn.execute(f"CREATE TRIGGER IF NOT EXISTS {name} {event} BEGIN {' '.join(body)} END")
+    rebuild_sqlite_summaries(conn)
+
+def drop_sqlite_summaries(conn):
+    """Remove the triggers and the summary table (also left-overs of an aborted run)."""
+    with conn:
+        for name in SUMMARY_TRIGGERS:
+            conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+        conn.execute(f"DROP TABLE IF EXISTS {SUMMARY_TABLE}")
+
+def rebuild_sqlite_summaries(conn):
+    with conn:
+        conn.execute(f"DELETE FROM {SUMMARY_TABLE}")
+        for dim, sql in SQL_QUERIES.items():
+            conn.execute(
+                f"INSERT INTO {SUMMARY_TABLE} (Dim, Key, Revenue) "
+                f"SELECT '{dim}', Key, Revenue FROM ({sql}) WHERE Key IS NOT NULL"
+            )
+
+def sqlite_summary(conn, dim):
+    return conn.execute(f"SELECT Key, Revenue FROM {SUMMARY_TABLE} WHERE Dim = ?", (dim,)).fetchall()
+
+# --- Mongo summary collections, maintained by the write paths ---------------------
+
+def summary_deltas(customer_id, country, invoice_date, items, sign=1):
+    """
+    Revenue change per summary key for adding (sign=1) or removing (sign=-1) the
+    given (stockCode, quantity, unitPrice) items of one invoice.
+    """
+    deltas = {}
+    month = month_key(invoice_date)
+    for stock_code, quantity, unit_price in items:
+        revenue = sign * quantity * unit_price
+        for dim, key in (("customer", customer_id), ("country", country), ("product", stock_code), ("month", month)):
+            if key is not None:
+                deltas[(dim, key)] = deltas.get((dim, key), 0) + revenue
+    return deltas
+
+def apply_summary_deltas(coll, deltas, session=None):
+    """One unordered bulk_write of $inc upserts; pass the write's session to keep it in its transaction."""
+    if not deltas:
+        return
+    ops = [
+        UpdateOne({"_id": f"{dim}:{key}"}, {"$inc": {"revenue": value}, "$setOnInsert": {"dim": dim, "key": key}}, upsert=True)
+        for (dim, key), value in deltas.items()
+    ]
+    coll.bulk_write(ops, ordered=False, session=session)
+
+def rebuild_mongo_summaries(db):
+    """Recompute both summary collections from full aggregations."""
+    for system, run in (("mongo_tx", mongo_tx_revenue), ("mongo_cc", mongo_cc_revenue)):
+        coll = db[SUMMARY_COLLECTIONS[system]]
+        coll.delete_many({})
+        docs = [
+            {"_id": f"{dim}:{key}", "dim": dim, "key": key, "revenue": revenue}
+            for dim in DIMENSIONS for key, revenue in run(db, dim) if key is not None
+        ]
+        if docs:
+            coll.insert_many(docs, ordered=False)
+
+def drop_mongo_summaries(db):
+    for coll_name in SUMMARY_COLLECTIONS.values():
+        db.drop_collection(coll_name)
+
+def mongo_summary(db, system, dim):
+    return [(d["key"], d["revenue"]) for d in db[SUMMARY_COLLECTIONS[system]].find({"dim": dim}, {"key": 1, "revenue": 1})]
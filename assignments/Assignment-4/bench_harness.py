@@ -0,0 +1,61 @@
+import json
+import time
+import numpy as np
+import pandas as pd
+from instrumentation import operation
+
+def time_func(func, *a, **kw):
+    t0 = time.perf_counter()
+    func(*a, **kw)
+    return time.perf_counter() - t0
+
+def measure(system, op_name, func, measured_args, warmup_args=()):
+    """
+    Call func(*args) for every warmup tuple (not recorded), then time it once per
+    measured tuple. Returns raw result rows. Measured calls run inside an
+    instrumentation.operation block so their commands are attributed to them.
+    """
+    for args in warmup_args:
+        func(*args)
+    rows = []
+    for i, args in enumerate(measured_args):
+        with operation(system, op_name):
+            t = time_func(func, *args)
+        rows.append({"system": system, "operation": op_name, "iteration": i, "time": t})
+    return rows
+
+def summarize(results):
+    """Per system x operation: count, mean, std, p50/p95/p99/max (ms) and ops/sec."""
+    rows = []
+    df = pd.DataFrame(results)
+    for (system, operation), group in df.groupby(["system", "operation"], sort=False):
+        t = group["time"].to_numpy()
+        rows.append({
+            "system": system,
+            "operation": operation,
+            "count": len(t),
+            "mean_ms": t.mean() * 1000,
+            "std_ms": t.std(ddof=1) * 1000 if len(t) > 1 else 0.0,
+            "p50_ms": np.percentile(t, 50) * 1000,
+            "p95_ms": np.percentile(t, 95) * 1000,
+            "p99_ms": np.percentile(t, 99) * 1000,
+            "max_ms": t.max() * 1000,
+            "throughput_ops": len(t) / t.sum() if t.sum() > 0 else 0.0,
+        })
+    return rows
+
+def write_results(results, summary, config, raw_csv="benchmark_results.csv", prefix="benchmark_summary"):
+    """Raw timings as CSV; summary as CSV and as JSON (with the run config) for diffing runs."""
+    pd.DataFrame(results).to_csv(raw_csv, index=False)
+    pd.DataFrame(summary).to_csv(f"{prefix}.csv", index=False)
+    with open(f"{prefix}.json", "w") as f:
+        json.dump({"config": config, "summary": summary}, f, indent=4)
+    print(f"Saved {len(results)} rows to {raw_csv}, summary to {prefix}.csv/.json")
+
+def print_summary(summary):
+    print(f"{'system':<14} {'operation':<20} {'n':>5} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8} {'std':>8} {'ops/s':>9}")
+    for row in summary:
+        print(
+            f"{row['system']:<14} {row['operation']:<20} {row['count']:>5} {row['p50_ms']:>8.3f} {row['p95_ms']:>8.3f} "
+            f"{row['p99_ms']:>8.3f} {row['max_ms']:>8.3f} {row['std_ms']:>8.3f} {row['throughput_ops']:>9.1f}"
+        )
@@ -0,0 +1,203 @@
+# Concurrent load generator for the Q3 CRUD operations: N workers (threads or
+# processes) issue a read/update/insert mix against one system, either closed-loop
+# (as fast as each worker can) or open-loop at a target QPS, for each
+# concurrency level in turn.
+import random
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from pymongo.errors import PyMongoError
+from mongo_helpers import get_mongo_client
+from sqlite_dao import SQLiteDAO
+from Q1 import create_secondary_indexes
+import Q3
+
+SYSTEMS = ["sqlite", "mongo_tx", "mongo_cc"]
+DEFAULT_MIX = {"read": 0.8, "update": 0.15, "insert": 0.05}
+CONCURRENCY_LEVELS = [1, 2, 4, 8, 16]
+DURATION = 10.0  # seconds per concurrency level
+SQLITE_BUSY_TIMEOUT = 30.0  # seconds a writer waits for SQLite's single write lock
+
+def _operations(system, dao, client, db):
+    """op name -> func(key, new_id) for one system."""
+    if system == "sqlite":
+        return {
+            "read": lambda key, new_id: Q3.bench_sqlite_read_invoice(dao, key),
+            "update": lambda key, new_id: Q3.bench_sqlite_update(dao, key),
+            "insert": lambda key, new_id: Q3.bench_sqlite_insert(dao, new_id),
+        }
+    if system == "mongo_tx":
+        return {
+            "read": lambda key, new_id: Q3.bench_mongo_read_invoice_transactional(db, key),
+            "update": lambda key, new_id: Q3.bench_mongo_update_transactional(client, db, key),
+            "insert": lambda key, new_id: Q3.bench_mongo_insert_transactional(client, db, new_id),
+        }
+    return {
+        "read": lambda key, new_id: Q3.bench_mongo_read_customer_centric(db, key),
+        "update": lambda key, new_id: Q3.bench_mongo_update_customer_centric(db, key),
+        "insert": lambda key, new_id: Q3.bench_mongo_insert_customer_centric(db, new_id, new_id),
+    }
+
+def run_worker(system, worker_id, keys, mix, duration, interval=None, seed=Q3.SEED, client=None, tag=""):
+    """
+    Issue operations for ``duration`` seconds. With ``interval`` set the worker is
+    open-loop: operation n is scheduled at start + n * interval and its latency is
+    measured from that scheduled time, so queueing delay is included.
+    ``tag`` keeps inserted ids unique across runs/levels with the same seed.
+    Returns (op, latency_seconds, ok) tuples.
+    """
+    rng = random.Random(seed * 1000 + worker_id)
+    dao = None
+    own_client = False
+    if system == "sqlite":
+        dao = SQLiteDAO(Q3.SQLITE_DB, timeout=SQLITE_BUSY_TIMEOUT)
+    elif client is None:
+        client = get_mongo_client(Q3.MONGO_URI, max_pool_size=4)
+        own_client = True
+    db = client["online_retail"] if client is not None else None
+    ops = _operations(system, dao, client, db)
+    names = list(mix)
+    weights = [mix[n] for n in names]
+
+    samples = []
+    start = time.perf_counter()
+    n = 0
+    while True:
+        scheduled = start + n * interval if interval else time.perf_counter()
+        if scheduled - start >= duration:
+            break
+        if interval:
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        op = rng.choices(names, weights)[0]
+        new_id = f"{Q3.BENCH_PREFIX}LG_{system}_{tag}_{worker_id}_{n}_{seed}"
+        try:
+            ops[op](rng.choice(keys), new_id)
+            ok = True
+        except (sqlite3.Error, PyMongoError):
+            ok = False
+        samples.append((op, time.perf_counter() - scheduled, ok))
+        n += 1
+
+    if dao is not None:
+        dao.close()
+    if own_client:
+        client.close()
+    return samples
+
+def run_level(system, concurrency, keys, mix, duration, target_qps=None, processes=False, client=None, seed=Q3.SEED):
+    """Run ``concurrency`` workers at once and summarise the level."""
+    interval = concurrency / target_qps if target_qps else None
+    tag = f"c{concurrency}"
+    if processes:
+        # every process opens its own connections; a MongoClient must not cross a fork
+        with ProcessPoolExecutor(max_workers=concurrency) as pool:
+            futures = [pool.submit(run_worker, system, w, keys, mix, duration, interval, seed, None, tag)
+                       for w in range(concurrency)]
+    else:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            futures = [pool.submit(run_worker, system, w, keys, mix, duration, interval, seed, client, tag)
+                       for w in range(concurrency)]
+    samples = [s for f in futures for s in f.result()]
+
+    rows = []
+    for op in ["all"] + list(mix):
+        lat = np.array([s[1] for s in samples if s[2] and (op == "all" or s[0] == op)])
+        errors = sum(1 for s in samples if not s[2] and (op == "all" or s[0] == op))
+        if len(lat) == 0 and errors == 0:
+            continue
+        rows.append({
+            "system": system,
+            "concurrency": concurrency,
+            "operation": op,
+            "target_qps": target_qps or 0,
+            "ops": len(lat),
+            "errors": errors,
+            "throughput_ops": len(lat) / duration,
+            "p50_ms": np.percentile(lat, 50) * 1000 if len(lat) else 0.0,
+            "p95_ms": np.percentile(lat, 95) * 1000 if len(lat) else 0.0,
+            "p99_ms": np.percentile(lat, 99) * 1000 if len(lat) else 0.0,
+            "max_ms": lat.max() * 1000 if len(lat) else 0.0,
+        })
+    if not rows:
+        return rows
+    overall = rows[0]
+    print(
+        f"{system:<9} c={concurrency:<3} {overall['throughput_ops']:>9.1f} ops/s  p50 {overall['p50_ms']:.2f}ms "
+        f"p95 {overall['p95_ms']:.2f}ms p99 {overall['p99_ms']:.2f}ms  errors {overall['errors']}"
+    )
+    return rows
+
+def sample_keys(system, client, iterations, seed=Q3.SEED):
+    if system == "sqlite":
+        conn = Q3.sqlite_connect()
+        keys = Q3.sqlite_get_random_invoice_numbers(conn, iterations, seed=seed)
+        conn.close()
+        return keys
+    db = client["online_retail"]
+    if system == "mongo_tx":
+        return Q3.mongo_get_random_invoice_ids(db, iterations, "invoices", seed=seed)
+    return Q3.mongo_get_random_customer_ids(db, iterations, seed=seed)
+
+def run_loadgen(systems=SYSTEMS, levels=CONCURRENCY_LEVELS, mix=DEFAULT_MIX, duration=DURATION,
+                target_qps=None, processes=False, n_keys=1000, seed=Q3.SEED, output="loadgen_results.csv"):
+    # only connect (get_mongo_client pings) when a Mongo system is selected
+    use_mongo = any(system != "sqlite" for system in systems)
+    client = get_mongo_client(Q3.MONGO_URI, max_pool_size=max(100, max(levels))) if use_mongo else None
+    if "sqlite" in systems:
+        # provision once here, not in every worker's DAO
+        conn = Q3.sqlite_connect()
+        create_secondary_indexes(conn)
+        conn.close()
+    rows = []
+    for system in systems:
+        keys = sample_keys(system, client, n_keys, seed)
+        if not keys:
+            print(f"{system}: no keys to sample, skipping")
+            continue
+        for concurrency in levels:
+            rows.extend(run_level(system, concurrency, keys, mix, duration, target_qps, processes, client, seed))
+
+    conn = Q3.sqlite_connect() if "sqlite" in systems else None
+    Q3.cleanup_benchmark_rows(conn, client["online_retail"] if use_mongo else None)
+    if conn is not None:
+        conn.close()
+    if use_mongo:
+        client.close()
+    pd.DataFrame(rows).to_csv(output, index=False)
+    print(f"Saved {len(rows)} rows to {output}")
+    return rows
+
+def parse_mix(text):
+    """'read=0.8,update=0.15,insert=0.05' -> dict"""
+    mix = {}
+    for part in text.split(","):
+        name, weight = part.split("=")
+        if name not in DEFAULT_MIX:
+            raise ValueError(f"unknown operation {name!r}; expected one of {list(DEFAULT_MIX)}")
+        mix[name] = float(weight)
+    return mix
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Concurrent load generator for the CRUD benchmark")
+    parser.add_argument("--systems", default=",".join(SYSTEMS))
+    parser.add_argument("--concurrency", default=",".join(map(str, CONCURRENCY_LEVELS)), help="comma-separated worker counts")
+    parser.add_argument("--mix", default="read=0.8,update=0.15,insert=0.05")
+    parser.add_argument("--duration", type=float, default=DURATION, help="seconds per concurrency level")
+    parser.add_argument("--qps", type=float, default=None, help="open-loop target QPS (default: closed loop)")
+    parser.add_argument("--processes", action="store_true", help="one process per worker instead of threads")
+    parser.add_argument("--seed", type=int, default=Q3.SEED)
+    args = parser.parse_args()
+    run_loadgen(
+        systems=args.systems.split(","),
+        levels=[int(c) for c in args.concurrency.split(",")],
+        mix=parse_mix(args.mix),
+        duration=args.duration,
+        target_qps=args.qps,
+        processes=args.processes,
+        seed=args.seed,
+    )
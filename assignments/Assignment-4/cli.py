@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+# One entry point for the assignment scripts:
+#
+#   python cli.py load-sqlite [--stream | --bulk ...]
+#   python cli.py load-mongo-tx [--batch-size N] [--pipeline]
+#   python cli.py load-mongo-cc [--batch-size N] [--max-embedded N] [--pipeline]
+#   python cli.py bench [Q3 options]
+#   python cli.py config [--output PATH]
+#   python cli.py startup [--runs N]
+#
+# Only the standard library is imported up front; a command imports its module
+# (and with it pandas / numpy / pymongo) when it runs. Mongo commands share one
+# pooled, pre-warmed client (mongo_helpers.shared_client). Import, connection
+# setup and the command itself are timed separately.
+import importlib
+import os
+import subprocess
+import sys
+import time
+
+T_START = time.perf_counter()
+
+# command -> (module with main(argv[, client]), needs a Mongo client, help)
+COMMANDS = {
+    "load-sqlite": ("Q1", False, "load online_retail.csv into SQLite"),
+    "load-mongo-tx": ("mongo_transactional", True, "load the transactional Mongo model"),
+    "load-mongo-cc": ("mongo_customer_centric", True, "load the customer-centric Mongo model"),
+    "bench": ("Q3", True, "CRUD / analytics benchmark, SQLite vs MongoDB"),
+    "config": ("Q4", True, "write the MongoDB deployment config JSON"),
+}
+STARTUP_RUNS = 5
+
+def usage():
+    lines = ["usage: cli.py <command> [options]", "", "commands:"]
+    lines += [f"  {name:<14} {help_text}" for name, (_, _, help_text) in COMMANDS.items()]
+    lines.append(f"  {'startup':<14} time cold start of the CLI and its commands (--runs N)")
+    return "\n".join(lines)
+
+def connect(command):
+    from mongo_helpers import shared_client, CONNECT_TIMINGS
+    listeners = []
+    if command == "bench":
+        # Q3 reports command-level stats; the listener has to exist when the client is built
+        from instrumentation import MongoCommandRecorder
+        listeners.append(MongoCommandRecorder(sizes=True))
+    # config's first command (server_info) is a round trip of its own, so no ping
+    client = shared_client(os.environ.get("MONGO_URI"), event_listeners=listeners, ping=command != "config")
+    return client, dict(CONNECT_TIMINGS)
+
+def run_command(command, argv):
+    module_name, needs_client, _ = COMMANDS[command]
+    t0 = time.perf_counter()
+    module = importlib.import_module(module_name)
+    t_import = time.perf_counter() - t0
+
+    wants_help = "-h" in argv or "--help" in argv
+    client, connect_timings = None, {}
+    t1 = time.perf_counter()
+    if needs_client and not wants_help:
+        client, connect_timings = connect(command)
+    t_connect = time.perf_counter() - t1
+
+    t2 = time.perf_counter()
+    try:
+        if needs_client:
+            module.main(argv, client=client)
+        else:
+            module.main(argv)
+    finally:
+        if client is not None:
+            from mongo_helpers import close_shared_clients
+            close_shared_clients()
+    t_run = time.perf_counter() - t2
+
+    detail = ""
+    if connect_timings:
+        detail = f" (client {connect_timings['init_seconds']:.3f}s"
+        if connect_timings["ping_seconds"] is not None:
+            detail += f", first ping {connect_timings['ping_seconds']:.3f}s"
+        detail += ")"
+    print(f"[cli] {command}: startup {t0 - T_START:.3f}s, import {t_import:.3f}s, "
+          f"connect {t_connect:.3f}s{detail}, run {t_run:.3f}s")
+
+def startup_benchmark(runs=STARTUP_RUNS):
+    """
+    Wall time of fresh interpreters: bare python, the CLI's help, and --help of
+    each command (imports its module but does not connect), next to importing the
+    old entry scripts directly.
+    """
+    here = os.path.dirname(os.path.abspath(__file__))
+    cli = os.path.join(here, "cli.py")
+    cases = [("python -c pass", [sys.executable, "-c", "pass"]), ("cli.py --help", [sys.executable, cli, "--help"])]
+    cases += [(f"cli.py {name} --help", [sys.executable, cli, name, "--help"]) for name in COMMANDS]
+    cases += [(f"import {m}", [sys.executable, "-c", f"import {m}"]) for m in ("Q3", "Q4")]
+
+    print(f"{'case':<30} {'min ms':>9} {'median ms':>10} {'max ms':>9}")
+    rows = []
+    for label, cmd in cases:
+        times = []
+        for _ in range(runs):
+            t0 = time.perf_counter()
+            subprocess.run(cmd, cwd=here, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=False)
+            times.append((time.perf_counter() - t0) * 1000)
+        times.sort()
+        rows.append({"case": label, "min_ms": times[0], "median_ms": times[len(times) // 2], "max_ms": times[-1]})
+        print(f"{label:<30} {times[0]:>9.1f} {times[len(times) // 2]:>10.1f} {times[-1]:>9.1f}")
+    return rows
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv or argv[0] in ("-h", "--help"):
+        print(usage())
+        return 0
+    command, rest = argv[0], argv[1:]
+    if command == "startup":
+        runs = int(rest[rest.index("--runs") + 1]) if "--runs" in rest else STARTUP_RUNS
+        startup_benchmark(runs)
+        return 0
+    if command not in COMMANDS:
+        print(f"unknown command {command!r}\n\n{usage()}", file=sys.stderr)
+        return 2
+    run_command(command, rest)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
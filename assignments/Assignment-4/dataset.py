@@ -0,0 +1,216 @@
+import hashlib
+import io
+import json
+import os
+import shutil
+import numpy as np
+import pandas as pd
+
+DATA_FILE = "online_retail.csv"
+CACHE_DIR = ".dataset_cache"
+PART_ROWS = 100_000  # raw CSV rows per cached part
+COLUMNS = ["InvoiceNo", "StockCode", "Description", "Quantity", "InvoiceDate", "UnitPrice", "CustomerID", "Country"]
+REQUIRED_COLUMNS = ['InvoiceNo', 'CustomerID', 'StockCode', 'Description']
+# parsed as text in every part (per-chunk inference would mix ints and strings)
+TEXT_COLUMNS = {"InvoiceNo": str, "StockCode": str, "Description": str, "InvoiceDate": str, "Country": str}
+ROW_COLUMN = "_row"  # 0-based row number in the CSV, used to honour nrows
+FORMAT_VERSION = 1
+# also key the cache on a SHA-256 of the whole CSV (catches in-place rewrites
+# that keep size and mtime; costs a full read of the file on every load)
+CONTENT_HASH = os.environ.get("DATASET_CONTENT_HASH") == "1"
+
+def file_digest(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def source_key(path=DATA_FILE, content_hash=None):
+    """Identity of the CSV: (path, size, mtime), plus its content hash if requested."""
+    st = os.stat(path)
+    key = {"path": os.path.abspath(path), "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+    if CONTENT_HASH if content_hash is None else content_hash:
+        key["sha256"] = file_digest(path)
+    return key
+
+def cache_dir_for(path=DATA_FILE, required=REQUIRED_COLUMNS, cache_root=CACHE_DIR):
+    """Cache location keyed by source_key(path) and the cleaning options."""
+    options = json.dumps({"source": source_key(path), "required": sorted(required), "version": FORMAT_VERSION},
+                         sort_keys=True)
+    options_hash = hashlib.sha256(options.encode()).hexdigest()[:16]
+    name = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(cache_root, f"{name}_{options_hash}")
+
+def _write_part(part_dir, df):
+    """
+    One .npy per column. Text becomes fixed-width unicode plus a null mask; only
+    numeric columns stay memory-mapped on read, text is converted to objects for pandas.
+    """
+    os.makedirs(part_dir)
+    for name in df.columns:
+        col = df[name]
+        if pd.api.types.is_numeric_dtype(col):
+            np.save(os.path.join(part_dir, f"{name}.npy"), col.to_numpy())
+            continue
+        mask = col.isna().to_numpy()
+        np.save(os.path.join(part_dir, f"{name}.npy"), col.fillna("").astype(str).to_numpy().astype(str))
+        if mask.any():
+            np.save(os.path.join(part_dir, f"{name}.mask.npy"), mask)
+
+def _read_part(part_dir, columns):
+    data = {}
+    for name in columns:
+        values = np.load(os.path.join(part_dir, f"{name}.npy"), mmap_mode="r")
+        if values.dtype.kind == "U":
+            values = values.astype(object)
+            mask_path = os.path.join(part_dir, f"{name}.mask.npy")
+            if os.path.exists(mask_path):
+                values[np.load(mask_path)] = np.nan
+        data[name] = values
+    return pd.DataFrame(data)
+
+def build_cache(path=DATA_FILE, required=REQUIRED_COLUMNS, cache_root=CACHE_DIR):
+    """
+    Parse and clean the CSV once, part by part (bounded memory), and store it
+    under cache_dir_for(...). meta.json is written last, so a half-built cache
+    is never used.
+    """
+    target = cache_dir_for(path, required, cache_root)
+    tmp = target + ".tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    parts = []
+    offset = 0
+    with pd.read_csv(path, encoding="unicode_escape", dtype=TEXT_COLUMNS, chunksize=PART_ROWS) as reader:
+        for i, chunk in enumerate(reader):
+            chunk[ROW_COLUMN] = np.arange(offset, offset + len(chunk), dtype=np.int64)
+            offset += len(chunk)
+            chunk = chunk.dropna(subset=list(required))
+            name = f"part-{i:05d}"
+            _write_part(os.path.join(tmp, name), chunk)
+            parts.append({"name": name, "rows": len(chunk), "first_row": int(chunk[ROW_COLUMN].iloc[0]) if len(chunk) else offset})
+    with open(os.path.join(tmp, "meta.json"), "w") as f:
+        json.dump({"source": os.path.abspath(path), "raw_rows": offset, "required": list(required), "parts": parts}, f, indent=2)
+    shutil.rmtree(target, ignore_errors=True)
+    os.replace(tmp, target)
+    print(f"Cached {offset} CSV rows ({sum(p['rows'] for p in parts)} after cleaning) in {target}")
+    return target
+
+def remove_stale_caches(path=DATA_FILE, required=REQUIRED_COLUMNS, cache_root=CACHE_DIR, keep=None):
+    """Delete caches of ``path`` (same cleaning options) other than ``keep``, e.g. after the file changed."""
+    if not os.path.isdir(cache_root):
+        return
+    source = os.path.abspath(path)
+    for name in os.listdir(cache_root):
+        cache_dir = os.path.join(cache_root, name)
+        if cache_dir == keep:
+            continue
+        try:
+            with open(os.path.join(cache_dir, "meta.json")) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            continue  # not a finished cache (build_cache clears its own .tmp)
+        if meta.get("source") == source and sorted(meta.get("required", [])) == sorted(required):
+            shutil.rmtree(cache_dir, ignore_errors=True)
+
+def _cache(path, required, cache_root, build=True):
+    """
+    (cache dir, meta) for the CSV; built on a miss, or (None, None) if ``build``
+    is false. A miss also removes caches of older versions of the file.
+    """
+    target = cache_dir_for(path, required, cache_root)
+    if not os.path.exists(os.path.join(target, "meta.json")):
+        remove_stale_caches(path, required, cache_root, keep=target)
+        if not build:
+            return None, None
+        build_cache(path, required, cache_root)
+    with open(os.path.join(target, "meta.json")) as f:
+        return target, json.load(f)
+
+def _iter_csv(columns, nrows, chunk_size, path, required):
+    """iter_chunks straight from the CSV: only the first ``nrows`` rows are parsed."""
+    usecols = list(dict.fromkeys(columns + list(required)))
+    dtype = {name: kind for name, kind in TEXT_COLUMNS.items() if name in usecols}
+    with pd.read_csv(path, encoding="unicode_escape", dtype=dtype, usecols=usecols, nrows=nrows,
+                     chunksize=chunk_size or PART_ROWS) as reader:
+        for chunk in reader:
+            chunk = chunk.dropna(subset=list(required))
+            if len(chunk):
+                yield chunk[columns].reset_index(drop=True)
+
+def iter_chunks(columns=None, nrows=None, chunk_size=None, path=DATA_FILE, required=REQUIRED_COLUMNS, cache_root=CACHE_DIR):
+    """
+    Yield cleaned DataFrames with only ``columns`` (default: all CSV columns).
+    ``nrows`` counts raw CSV rows, like pd.read_csv(nrows=...), so loaders keep
+    their over-fetch semantics. Chunks are at most ``chunk_size`` rows (default:
+    one cached part each).
+
+    Without a cache, nrows-bounded and chunked (streaming) reads parse the CSV
+    directly, so the first rows are not held back by parsing the whole file;
+    only a full load builds the cache (or run ``python dataset.py`` up front).
+    """
+    columns = list(columns or COLUMNS)
+    target, meta = _cache(path, required, cache_root, build=nrows is None and chunk_size is None)
+    if target is None:
+        yield from _iter_csv(columns, nrows, chunk_size, path, required)
+        return
+    for part in meta["parts"]:
+        if nrows is not None and part["first_row"] >= nrows:
+            break
+        if part["rows"] == 0:
+            continue
+        df = _read_part(os.path.join(target, part["name"]), columns + [ROW_COLUMN])
+        if nrows is not None:
+            df = df[df[ROW_COLUMN] < nrows]
+        df = df.drop(columns=ROW_COLUMN)
+        step = chunk_size or len(df) or 1
+        for start in range(0, len(df), step):
+            yield df.iloc[start:start + step].reset_index(drop=True)
+
+def load(columns=None, nrows=None, path=DATA_FILE, required=REQUIRED_COLUMNS, cache_root=CACHE_DIR):
+    """The cleaned dataset (or its first ``nrows`` raw rows) as one DataFrame."""
+    chunks = list(iter_chunks(columns, nrows, None, path, required, cache_root))
+    if not chunks:
+        return pd.DataFrame(columns=list(columns or COLUMNS))
+    return pd.concat(chunks, ignore_index=True)
+
+def iter_raw_chunks(path=DATA_FILE, offset=0, chunk_rows=PART_ROWS, include_partial=False):
+    """
+    Yield (header + lines, end_offset, n_lines) for the CSV from byte ``offset``
+    on, as unparsed bytes. Chunks end on an invoice boundary (the CSV is grouped
+    by InvoiceNo), so an invoice never straddles two chunks. A trailing line
+    without a newline is taken to be still being appended (incremental tailing)
+    and is not yielded, unless ``include_partial`` is set (full-file loads).
+    """
+    with open(path, "rb") as f:
+        header = f.readline()
+        if offset < f.tell():
+            offset = f.tell()
+        f.seek(offset)
+        lines = []
+        last_invoice = None
+        while True:
+            line = f.readline()
+            complete = line.endswith(b"\n") or (include_partial and line != b"")
+            invoice = line.split(b",", 1)[0] if complete else None
+            boundary = len(lines) >= chunk_rows and invoice != last_invoice
+            if lines and (not complete or boundary):
+                offset += sum(len(l) for l in lines)
+                yield header + b"".join(lines), offset, len(lines)
+                lines = []
+            if not complete:
+                return
+            lines.append(line)
+            last_invoice = invoice
+
+def parse_raw(data):
+    """A chunk from iter_raw_chunks as an (uncleaned) DataFrame, parsed like build_cache does."""
+    return pd.read_csv(io.BytesIO(data), encoding="unicode_escape", dtype=TEXT_COLUMNS)
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Build the parsed/cleaned dataset cache")
+    parser.add_argument("--path", default=DATA_FILE)
+    args = parser.parse_args()
+    build_cache(args.path)
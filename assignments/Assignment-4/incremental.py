@@ -0,0 +1,213 @@
+# Incremental, resumable ingestion of online_retail.csv into SQLite and both Mongo
+# models. A per-target checkpoint records how far into the CSV (byte offset, rows,
+# highest InvoiceNo) has been committed; re-runs start reading at that offset, so
+# rows that are already loaded cost neither parsing nor a database round trip, and
+# appending a day's data to the CSV only costs the new rows.
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import time
+from pymongo.errors import PyMongoError
+import dataset
+from Q1 import DB_NAME, setup_db, insert_chunk
+from mongo_helpers import get_mongo_client, CircuitOpenError
+from mongo_documents import build_transactional_bundles, build_customer_centric_invoices
+from mongo_indexes import ensure_indexes
+from instrumentation import RECORDER, MongoCommandRecorder, instrument_sqlite, operation, print_report
+import mongo_transactional
+import mongo_customer_centric
+
+DATA_FILE = "online_retail.csv"
+CHECKPOINT_DIR = ".checkpoints"
+COMMANDS_CSV = "ingest_commands.csv"  # per-chunk round trips / statements of the last run
+CHUNK_ROWS = 50_000  # CSV lines per chunk (extended to the end of the last invoice)
+HEAD_BYTES = 64 * 1024  # prefix hashed to detect a rewritten (not appended) file
+
+def _head_hash(path, offset):
+    """Hash of the already-loaded prefix (at most HEAD_BYTES), which an append leaves unchanged."""
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read(min(HEAD_BYTES, offset))).hexdigest()
+
+def invoice_number(invoice_no):
+    """Numeric part of an InvoiceNo ('C536379' -> 536379), or None."""
+    digits = re.sub(r"^\D+", "", str(invoice_no))
+    return int(digits) if digits.isdigit() else None
+
+def load_checkpoint(target, path=DATA_FILE, checkpoint_dir=CHECKPOINT_DIR):
+    """
+    The saved checkpoint for ``target`` if it still matches ``path``. If the file
+    was rewritten (different head, or shorter than the offset) the byte offset is
+    dropped and the checkpoint is flagged ``rewritten``: until that file has been
+    read to its end, invoices up to ``skip_through`` (the old ``max_invoice``) are
+    taken to be loaded already and skipped.
+    """
+    empty = {"source": os.path.abspath(path), "offset": 0, "rows": 0, "max_invoice": None, "head": _head_hash(path, 0),
+             "rewritten": False, "skip_through": None}
+    cp_path = os.path.join(checkpoint_dir, f"{target}.json")
+    if not os.path.exists(cp_path):
+        return empty
+    with open(cp_path) as f:
+        cp = json.load(f)
+    offset = cp.get("offset", 0)
+    if offset > os.path.getsize(path) or cp.get("head") != _head_hash(path, offset):
+        print(f"{target}: {path} was rewritten; resuming by InvoiceNo > {cp.get('max_invoice')}")
+        return dict(empty, max_invoice=cp.get("max_invoice"), rewritten=True, skip_through=cp.get("max_invoice"))
+    return dict(empty, **cp)
+
+def save_checkpoint(target, cp, checkpoint_dir=CHECKPOINT_DIR):
+    """Atomic replace, so a crash leaves either the old or the new checkpoint."""
+    os.makedirs(checkpoint_dir, exist_ok=True)
+    cp_path = os.path.join(checkpoint_dir, f"{target}.json")
+    with open(cp_path + ".tmp", "w") as f:
+        json.dump(cp, f, indent=2)
+    os.replace(cp_path + ".tmp", cp_path)
+
+def iter_new_chunks(path, offset, chunk_rows=CHUNK_ROWS):
+    """
+    Yield (df, end_offset, n_lines) for the CSV from byte ``offset`` on; see
+    dataset.iter_raw_chunks. Chunks end on an invoice boundary, so an invoice
+    never straddles two checkpoints.
+    """
+    for data, end_offset, n_lines in dataset.iter_raw_chunks(path, offset, chunk_rows):
+        yield dataset.parse_raw(data), end_offset, n_lines
+
+def _new_rows(df, cp):
+    """
+    After a rewrite, drop rows at or below ``skip_through``. Appended rows are
+    never filtered by number: a late cancellation or an out-of-order export can
+    carry a lower InvoiceNo than rows already loaded.
+    """
+    if cp["rewritten"] and cp["skip_through"] is not None:
+        numbers = df["InvoiceNo"].map(invoice_number)
+        df = df[numbers.isna() | (numbers > cp["skip_through"])]
+    return df
+
+def _advance(cp, df, path, end_offset, n_lines):
+    numbers = [n for n in df["InvoiceNo"].map(invoice_number) if n is not None]
+    if numbers:
+        cp["max_invoice"] = max([cp["max_invoice"] or 0] + numbers)
+    cp["offset"] = end_offset
+    cp["rows"] += n_lines
+    cp["head"] = _head_hash(path, end_offset)
+
+class IncompleteChunkError(RuntimeError):
+    """Some rows of a chunk were not written; its checkpoint must not be saved."""
+
+def _run(target, path, chunk_rows, write_chunk):
+    """
+    Write chunk after chunk, saving the checkpoint after each one. ``write_chunk``
+    raises (e.g. IncompleteChunkError) unless the whole chunk was written, so a
+    failed chunk stays ahead of the checkpoint and the next run retries it.
+    """
+    cp = load_checkpoint(target, path)
+    start_rows = cp["rows"]
+    t0 = time.perf_counter()
+    resumed = True
+    for df, end_offset, n_lines in iter_new_chunks(path, cp["offset"], chunk_rows):
+        # the first chunk of a run may be partly written (a crash or failure before
+        # the checkpoint was saved, also on a first run); write_chunk makes that
+        # chunk idempotent
+        with operation(target, "ingest_chunk"):
+            write_chunk(_new_rows(df, cp), replay=resumed)
+        resumed = False
+        _advance(cp, df, path, end_offset, n_lines)
+        save_checkpoint(target, cp)
+        print(f"{target}: {cp['rows']} rows committed (offset {cp['offset']}, max InvoiceNo {cp['max_invoice']})")
+    if cp["rewritten"]:
+        # the rewritten file has been read to its end; later rows are appends
+        cp["rewritten"] = False
+        save_checkpoint(target, cp)
+    new_rows = cp["rows"] - start_rows
+    print(f"{target}: {new_rows} new rows in {time.perf_counter() - t0:.2f}s")
+    print_report(RECORDER.write(COMMANDS_CSV))
+    return new_rows
+
+def ingest_sqlite(path=DATA_FILE, db_path=DB_NAME, chunk_rows=CHUNK_ROWS):
+    conn = instrument_sqlite(sqlite3.connect(db_path))
+    conn.execute("PRAGMA foreign_keys = ON")
+    setup_db(conn)
+    seen = {"customers": set(), "products": set(), "invoices": set()}
+    # INSERT OR IGNORE already makes a replayed chunk idempotent
+    new_rows = _run("sqlite", path, chunk_rows, lambda df, replay: insert_chunk(conn, df, seen))
+    conn.close()
+    return new_rows
+
+def ingest_mongo_tx(path=DATA_FILE, uri=None, chunk_rows=CHUNK_ROWS, batch_size=100):
+    client = get_mongo_client(uri, event_listeners=[MongoCommandRecorder()])
+    db = client["online_retail"]
+
+    def write_chunk(df, replay):
+        bundles = build_transactional_bundles(df.dropna(subset=dataset.REQUIRED_COLUMNS))
+        if replay and bundles:
+            ids = [b[0]["_id"] for b in bundles]
+            existing = {d["_id"] for d in db.invoices.find({"_id": {"$in": ids}}, {"_id": 1})}
+            bundles = [b for b in bundles if b[0]["_id"] not in existing]
+        failed = 0
+        for i in range(0, len(bundles), batch_size):
+            batch = bundles[i:i + batch_size]
+            try:
+                mongo_transactional.insert_invoice_batch(client, db, batch)
+            except CircuitOpenError:
+                raise
+            except PyMongoError:
+                failed += len(batch) - mongo_transactional.insert_invoices_individually(client, db, batch)
+        if failed:
+            raise IncompleteChunkError(f"{failed} of {len(bundles)} invoices in the chunk were not written")
+
+    new_rows = _run("mongo_tx", path, chunk_rows, write_chunk)
+    ensure_indexes(db)
+    client.close()
+    return new_rows
+
+def ingest_mongo_cc(path=DATA_FILE, uri=None, chunk_rows=CHUNK_ROWS,
+                    max_embedded=mongo_customer_centric.MAX_EMBEDDED_INVOICES):
+    client = get_mongo_client(uri, event_listeners=[MongoCommandRecorder()])
+    db = client["online_retail"]
+    coll_customers = db.get_collection("customers_cc")
+    coll_buckets = db.get_collection(mongo_customer_centric.BUCKET_COLLECTION)
+
+    def write_chunk(df, replay):
+        invoices = build_customer_centric_invoices(df.dropna(subset=dataset.REQUIRED_COLUMNS))
+        if replay and invoices:
+            # $push is not idempotent: drop invoices a crashed run already embedded
+            ids = [inv["invoiceNo"] for _, _, inv in invoices]
+            existing = set()
+            for coll, field in ((coll_customers, "invoices.invoiceNo"), (coll_buckets, "invoices.invoiceNo")):
+                for doc in coll.find({field: {"$in": ids}}, {field: 1}):
+                    existing.update(inv["invoiceNo"] for inv in doc.get("invoices", []))
+            invoices = [entry for entry in invoices if entry[2]["invoiceNo"] not in existing]
+        customers = mongo_customer_centric.group_by_customer(invoices)
+        ids = list(customers)
+        for i in range(0, len(ids), mongo_customer_centric.BATCH_SIZE):
+            batch = {cid: customers[cid] for cid in ids[i:i + mongo_customer_centric.BATCH_SIZE]}
+            mongo_customer_centric.push_customers_batch(coll_customers, coll_buckets, batch, max_embedded)
+
+    new_rows = _run("mongo_cc", path, chunk_rows, write_chunk)
+    ensure_indexes(db)
+    client.close()
+    return new_rows
+
+def reset(target, checkpoint_dir=CHECKPOINT_DIR):
+    cp_path = os.path.join(checkpoint_dir, f"{target}.json")
+    if os.path.exists(cp_path):
+        os.remove(cp_path)
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Incremental, checkpointed ingestion")
+    parser.add_argument("target", choices=["sqlite", "mongo_tx", "mongo_cc"])
+    parser.add_argument("--path", default=DATA_FILE)
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    parser.add_argument("--reset", action="store_true", help="forget the checkpoint and start from the top")
+    args = parser.parse_args()
+    if args.reset:
+        reset(args.target)
+    uri = os.environ.get("MONGO_URI", None)
+    if args.target == "sqlite":
+        ingest_sqlite(args.path, chunk_rows=args.chunk_rows)
+    elif args.target == "mongo_tx":
+        ingest_mongo_tx(args.path, uri, chunk_rows=args.chunk_rows)
+    else:
+        ingest_mongo_cc(args.path, uri, chunk_rows=args.chunk_rows)
@@ -0,0 +1,168 @@
+# Command-level instrumentation: how many round trips / SQL statements each
+# logical operation makes, how long they took and (optionally) how many bytes
+# went over the wire. Work is attributed to whatever ``operation(system, name)``
+# block is active on the calling thread; commands outside any block are ignored.
+#
+# For Mongo, the driver-measured command time covers network + server; the rest
+# of an operation's wall time (wall_ms - command_ms) is Python/driver overhead.
+import bson
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+import pandas as pd
+from pymongo import monitoring
+
+PROGRESS_STEPS = 1000  # SQLite VM instructions between progress-handler calls
+COMMANDS_CSV = "benchmark_commands.csv"  # written next to benchmark_results.csv
+
+_current = contextvars.ContextVar("operation", default=None)
+
+class Recorder:
+    """Thread-safe aggregates per (system, operation) and per (system, operation, command)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.ops = {}
+            self.commands = {}
+
+    def add_op(self, key, seconds):
+        with self._lock:
+            count, total = self.ops.get(key, (0, 0.0))
+            self.ops[key] = (count + 1, total + seconds)
+
+    def add_command(self, key, command, seconds=0.0, request_bytes=0, reply_bytes=0, failed=False, steps=0):
+        with self._lock:
+            s = self.commands.get((key, command))
+            if s is None:
+                s = self.commands[(key, command)] = {
+                    "calls": 0, "seconds": 0.0, "max_seconds": 0.0, "request_bytes": 0,
+                    "reply_bytes": 0, "failures": 0, "vm_steps": 0,
+                }
+            s["calls"] += 1
+            s["seconds"] += seconds
+            s["max_seconds"] = max(s["max_seconds"], seconds)
+            s["request_bytes"] += request_bytes
+            s["reply_bytes"] += reply_bytes
+            s["failures"] += failed
+            s["vm_steps"] += steps
+
+    def report(self):
+        """One row per (system, operation, command) with per-operation averages."""
+        with self._lock:
+            ops, commands = dict(self.ops), {k: dict(v) for k, v in self.commands.items()}
+        command_time = {}
+        for (key, _), s in commands.items():
+            command_time[key] = command_time.get(key, 0.0) + s["seconds"]
+        rows = []
+        for ((system, operation), command), s in commands.items():
+            n_ops, wall = ops.get((system, operation), (0, 0.0))
+            per_op = max(n_ops, 1)
+            rows.append({
+                "system": system,
+                "operation": operation,
+                "command": command,
+                "ops": n_ops,
+                "calls": s["calls"],
+                "calls_per_op": s["calls"] / per_op,
+                "command_ms": s["seconds"] * 1000,
+                "command_ms_per_op": s["seconds"] * 1000 / per_op,
+                "max_command_ms": s["max_seconds"] * 1000,
+                "wall_ms_per_op": wall * 1000 / per_op,
+                # wall time not spent in any recorded command (Python, driver, locks)
+                "overhead_ms_per_op": max(wall - command_time[(system, operation)], 0.0) * 1000 / per_op,
+                "request_bytes_per_op": s["request_bytes"] / per_op,
+                "reply_bytes_per_op": s["reply_bytes"] / per_op,
+                "vm_steps_per_op": s["vm_steps"] / per_op,
+                "failures": s["failures"],
+            })
+        return rows
+
+    def write(self, path=COMMANDS_CSV):
+        rows = self.report()
+        pd.DataFrame(rows).to_csv(path, index=False)
+        print(f"Saved {len(rows)} command-level rows to {path}")
+        return rows
+
+RECORDER = Recorder()
+
+@contextmanager
+def operation(system, name, recorder=RECORDER):
+    """Attribute every command issued inside the block to (system, name)."""
+    token = _current.set((system, name))
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        recorder.add_op((system, name), time.perf_counter() - t0)
+        _current.reset(token)
+
+class MongoCommandRecorder(monitoring.CommandListener):
+    """
+    pymongo CommandListener feeding a Recorder. Durations and counts are free;
+    ``sizes=True`` re-encodes each command and reply to BSON to measure bytes,
+    which costs roughly one extra encode per write, so ingest jobs leave it off.
+    """
+
+    def __init__(self, recorder=RECORDER, sizes=False):
+        self.recorder = recorder
+        self.sizes = sizes
+        self._started = {}
+
+    def started(self, event):
+        key = _current.get()
+        if key is None:
+            return
+        size = len(bson.encode(event.command)) if self.sizes else 0
+        self._started[(event.connection_id, event.request_id)] = (key, size)
+
+    def _finish(self, event, reply, failed):
+        entry = self._started.pop((event.connection_id, event.request_id), None)
+        if entry is None:
+            return
+        key, request_bytes = entry
+        reply_bytes = len(bson.encode(reply)) if self.sizes and reply else 0
+        self.recorder.add_command(key, event.command_name, event.duration_micros / 1e6,
+                                  request_bytes, reply_bytes, failed)
+
+    def succeeded(self, event):
+        self._finish(event, event.reply, False)
+
+    def failed(self, event):
+        self._finish(event, None, True)
+
+def instrument_sqlite(conn, recorder=RECORDER, progress_steps=PROGRESS_STEPS):
+    """
+    Count statements (trace callback) and VM instructions (progress handler, in
+    units of ``progress_steps``) per operation on ``conn``. SQLite has no
+    per-statement timing hook, so time is the operation's wall time.
+    """
+    def trace(sql):
+        key = _current.get()
+        if key is not None:
+            recorder.add_command(key, sql.split(None, 1)[0].upper() if sql.strip() else "?")
+
+    def progress():
+        key = _current.get()
+        if key is not None:
+            recorder.add_command(key, "vm_steps", steps=progress_steps)
+        return 0
+
+    conn.set_trace_callback(trace)
+    conn.set_progress_handler(progress, progress_steps)
+    return conn
+
+def print_report(rows):
+    print(f"{'system':<14} {'operation':<20} {'command':<12} {'calls/op':>9} {'cmd ms/op':>10} {'wall ms/op':>10} {'B out/op':>10} {'B in/op':>10}")
+    for row in rows:
+        if row["command"] == "vm_steps":
+            continue
+        print(
+            f"{row['system']:<14} {row['operation']:<20} {row['command']:<12} {row['calls_per_op']:>9.2f} "
+            f"{row['command_ms_per_op']:>10.3f} {row['wall_ms_per_op']:>10.3f} "
+            f"{row['request_bytes_per_op']:>10.0f} {row['reply_bytes_per_op']:>10.0f}"
+        )
@@ -0,0 +1,93 @@
+import json
+import os
+import random
+
+DISTRIBUTIONS = ["uniform", "zipf", "cold"]
+POOL_FACTOR = 10  # candidate keys sampled on the server per key requested
+ZIPF_S = 1.1  # Zipf exponent for the hot-key distribution
+HOT_FRACTION = 0.1  # share of the candidate pool treated as hot (excluded by "cold")
+CACHE_DIR = ".bench_keys"
+FORMAT_VERSION = 2  # bumped when the way pools are ranked changes (older caches are ignored)
+
+def sqlite_sample(conn, table, key_column, n, rng):
+    """
+    Sample up to n distinct keys by probing random rowids in [min(rowid), max(rowid)]
+    instead of reading the whole key column. A probe that lands in a gap (deleted
+    rows) takes the next existing rowid.
+    """
+    lo, hi = conn.execute(f"SELECT min(rowid), max(rowid) FROM {table}").fetchone()
+    if lo is None:
+        return []
+    total = conn.execute(f"SELECT count(*) FROM {table}").fetchone()[0]
+    n = min(n, total)
+    keys = set()
+    sql = f"SELECT {key_column} FROM {table} WHERE rowid >= ? ORDER BY rowid LIMIT 1"
+    attempts = 0
+    while len(keys) < n and attempts < n * 20:
+        keys.add(conn.execute(sql, (rng.randint(lo, hi),)).fetchone()[0])
+        attempts += 1
+    return sorted(keys, key=str)
+
+def mongo_sample(coll, n):
+    """
+    Let the server pick n random documents with $sample; only _id crosses the
+    wire. $sample takes no seed: reproducibility comes from ranked_pool caching
+    the pool it returns.
+    """
+    return [doc["_id"] for doc in coll.aggregate([{"$sample": {"size": n}}, {"$project": {"_id": 1}}])]
+
+def apply_distribution(pool, k, distribution, rng):
+    """
+    Draw k keys from a candidate pool:
+      uniform - distinct keys, equally likely
+      zipf    - with repetition, rank r weighted 1 / r**ZIPF_S (a few hot keys dominate)
+      cold    - distinct keys from outside the hot head of the pool
+    """
+    if not pool:
+        return []
+    if distribution == "uniform":
+        return rng.sample(pool, min(k, len(pool)))
+    if distribution == "zipf":
+        weights = [1.0 / (rank ** ZIPF_S) for rank in range(1, len(pool) + 1)]
+        return rng.choices(pool, weights=weights, k=k)
+    if distribution == "cold":
+        tail = pool[int(len(pool) * HOT_FRACTION):] or pool
+        return rng.sample(tail, min(k, len(tail)))
+    raise ValueError(f"unknown distribution {distribution!r}; expected one of {DISTRIBUTIONS}")
+
+def _load_or_build(path, build, refresh):
+    if not refresh and os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+    value = build()
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(value, f)
+    return value
+
+def ranked_pool(name, size, seed, sample_pool, cache_dir=CACHE_DIR, refresh=False):
+    """
+    The candidate pool for (name, size, seed), shared by every distribution:
+    sample_pool(size, rng), sorted by key, then put in a seeded order. That order
+    is the hot ranking, so zipf's hot head and "cold"'s tail are complementary.
+    The pool is cached, so runs replay it even when the sampler is not seeded
+    (Mongo's $sample); refresh draws a new one.
+    """
+    def build():
+        pool = sorted(sample_pool(size, random.Random(seed)), key=str)
+        random.Random(seed).shuffle(pool)
+        return pool
+    path = os.path.join(cache_dir, f"{name}_pool_{size}_{seed}_v{FORMAT_VERSION}.json")
+    return _load_or_build(path, build, refresh)
+
+def cached_keys(name, k, distribution, seed, sample_pool, cache_dir=CACHE_DIR, refresh=False):
+    """
+    Return the key set for (name, k, distribution, seed) from cache_dir, or draw
+    it from ranked_pool(...) and store it, so repeated runs replay the same
+    workload.
+    """
+    def build():
+        pool = ranked_pool(name, k * POOL_FACTOR, seed, sample_pool, cache_dir, refresh)
+        return apply_distribution(pool, k, distribution, random.Random(f"{seed}:{distribution}"))
+    path = os.path.join(cache_dir, f"{name}_{distribution}_{k}_{seed}_v{FORMAT_VERSION}.json")
+    return _load_or_build(path, build, refresh)
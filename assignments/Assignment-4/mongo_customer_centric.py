@@ -1,72 +1,166 @@
-import pandas as pd
 from pymongo import UpdateOne
 from pymongo.errors import PyMongoError
-from mongo_helpers import get_mongo_client, retry_on_transient_errors
+from mongo_helpers import get_mongo_client, retry_on_transient_errors, RETRY_STATS, CircuitOpenError
+from mongo_indexes import ensure_indexes
+import dataset
+from mongo_documents import DOC_COLUMNS, build_customer_centric_invoices
 
 DATA_FILE = "online_retail.csv"
 N_INVOICES = 1000
+BATCH_SIZE = 500  # customers per unordered bulk_write
+MAX_EMBEDDED_INVOICES = None  # cap on embedded invoices per customer (None = no cap)
+BUCKET_COLLECTION = "customers_cc_buckets"
+BUCKET_SIZE = 100  # invoices per overflow bucket when max_embedded is 0 (otherwise max_embedded)
 
-def load_csv(n_rows):
-    df = pd.read_csv(DATA_FILE, encoding='unicode_escape', nrows=n_rows*3)
-    return df
-
-@retry_on_transient_errors()
-def push_invoice_for_customer(coll_customers, customer_id, customer_country, invoice_doc):
-    # Upsert the customer and push the invoice into the invoices array
-    coll_customers.update_one(
-        {"_id": customer_id},
-        {
-            "$setOnInsert": {"country": customer_country},
-            "$push": {"invoices": invoice_doc}
-        },
-        upsert=True
-    )
-
-def run(uri=None):
-    client = get_mongo_client(uri)
+def load_csv(n_rows, path=DATA_FILE):
+    # cleaned rows among the first n_rows*3 CSV rows (overfetch slightly), from the shared cache
+    return dataset.load(columns=DOC_COLUMNS, nrows=n_rows*3, path=path)
+
+def group_by_customer(invoices):
+    """customer_id -> (country, [invoice_doc, ...]), keeping first-seen order."""
+    customers = {}
+    for customer_id, customer_country, invoice_doc in invoices:
+        customers.setdefault(customer_id, (customer_country, []))[1].append(invoice_doc)
+    return customers
+
+def embedded_counts(coll_customers, customer_ids):
+    """Current length of the embedded invoices array for each existing customer."""
+    pipeline = [
+        {"$match": {"_id": {"$in": list(customer_ids)}}},
+        {"$project": {"n": {"$size": {"$ifNull": ["$invoices", []]}}}}
+    ]
+    return {doc["_id"]: doc["n"] for doc in coll_customers.aggregate(pipeline)}
+
+def written_invoices(coll_customers, coll_buckets, customer_ids):
+    """InvoiceNos already stored for these customers, embedded or in overflow buckets."""
+    customer_ids = list(customer_ids)
+    written = set()
+    for doc in coll_customers.find({"_id": {"$in": customer_ids}}, {"invoices.invoiceNo": 1}):
+        written.update(inv["invoiceNo"] for inv in doc.get("invoices", []))
+    for doc in coll_buckets.find({"customerId": {"$in": customer_ids}}, {"invoices.invoiceNo": 1}):
+        written.update(inv["invoiceNo"] for inv in doc.get("invoices", []))
+    return written
+
+def push_customers_batch(coll_customers, coll_buckets, customers, max_embedded=None):
+    """
+    One upsert per customer pushing all of its invoices with $each, sent as a
+    single unordered bulk_write. With ``max_embedded`` set, invoices beyond that
+    many per customer document go to ``coll_buckets`` in chunks of the same size
+    (BUCKET_SIZE for 0), which keeps customer documents well below the 16 MB limit.
+
+    Transient errors are retried. $push and the bucket inserts are not
+    idempotent and an attempt may have been applied with its ack lost, so every
+    retry first drops the invoices that are already stored.
+    """
+    attempts = []
+
+    @retry_on_transient_errors()
+    def write():
+        batch = customers
+        if attempts:
+            written = written_invoices(coll_customers, coll_buckets, customers)
+            batch = {
+                customer_id: (country, [doc for doc in docs if doc["invoiceNo"] not in written])
+                for customer_id, (country, docs) in customers.items()
+            }
+        attempts.append(1)
+        return _push_customers(coll_customers, coll_buckets, batch, max_embedded)
+
+    return write()
+
+def _push_customers(coll_customers, coll_buckets, customers, max_embedded):
+    existing = embedded_counts(coll_customers, customers) if max_embedded is not None else {}
+    bucket_size = max_embedded or BUCKET_SIZE
+    ops = []
+    buckets = []
+    for customer_id, (customer_country, invoice_docs) in customers.items():
+        embedded = invoice_docs
+        if max_embedded is not None:
+            room = max(0, max_embedded - existing.get(customer_id, 0))
+            embedded, overflow = invoice_docs[:room], invoice_docs[room:]
+            for i in range(0, len(overflow), bucket_size):
+                chunk = overflow[i:i + bucket_size]
+                buckets.append({"customerId": customer_id, "count": len(chunk), "invoices": chunk})
+        update = {"$setOnInsert": {"country": customer_country}}
+        if embedded:
+            update["$push"] = {"invoices": {"$each": embedded}}
+        ops.append(UpdateOne({"_id": customer_id}, update, upsert=True))
+
+    if ops:
+        coll_customers.bulk_write(ops, ordered=False)
+    if buckets:
+        coll_buckets.insert_many(buckets, ordered=False)
+    return len(buckets)
+
+def run(uri=None, batch_size=BATCH_SIZE, max_embedded=MAX_EMBEDDED_INVOICES, client=None, pipeline=False,
+        encoders=None, writers=None, path=DATA_FILE, n_invoices=None):
+    """
+    Load ``n_invoices`` invoices from ``path`` (default N_INVOICES; with
+    ``pipeline`` the whole file) grouped by customer: every customer gets a single
+    $push/$each upsert, sent ``batch_size`` customers per bulk_write.
+    ``pipeline`` hands the load to mongo_pipeline (encoder processes + writer
+    threads); ``batch_size`` then counts invoices per bulk_write.
+    A passed-in ``client`` (e.g. the CLI's shared one) is left open.
+    """
+    own_client = client is None
+    if own_client:
+        client = get_mongo_client(uri)
     db = client["online_retail"]
+
+    if pipeline:
+        import mongo_pipeline
+        mongo_pipeline.ingest("cc", client, path, n_invoices, batch_size, max_embedded=max_embedded,
+                              encoders=encoders or mongo_pipeline.N_ENCODERS, writers=writers or mongo_pipeline.N_WRITERS)
+        if own_client:
+            client.close()
+        return
+
     coll_customers = db.get_collection("customers_cc")  # customer-centric collection
+    coll_buckets = db.get_collection(BUCKET_COLLECTION)  # overflow invoices (max_embedded)
 
-    df = load_csv(N_INVOICES)
-    df = df.dropna(subset=['InvoiceNo', 'CustomerID', 'StockCode', 'Description'])
+    n_invoices = n_invoices or N_INVOICES
+    df = load_csv(n_invoices, path)
 
-    grouped = df.groupby('InvoiceNo')
+    customers = group_by_customer(build_customer_centric_invoices(df)[:n_invoices])
+    customer_ids = list(customers)
     processed = 0
+    n_buckets = 0
 
-    for invoice_no, group in grouped:
-        if processed >= N_INVOICES:
-            break
-
-        customer_id = str(group['CustomerID'].iloc[0])
-        customer_country = str(group['Country'].iloc[0])
-
-        invoice_doc = {
-            "invoiceNo": str(invoice_no),
-            "invoiceDate": str(group['InvoiceDate'].iloc[0]),
-            "items": []
-        }
-        for _, row in group.iterrows():
-            item = {
-                "stockCode": str(row['StockCode']),
-                "description": str(row['Description']),
-                "quantity": int(row['Quantity']) if not pd.isna(row['Quantity']) else 0,
-                "unitPrice": float(row['UnitPrice']) if not pd.isna(row['UnitPrice']) else 0.0
-            }
-            invoice_doc["items"].append(item)
-
+    for i in range(0, len(customer_ids), batch_size):
+        batch = {cid: customers[cid] for cid in customer_ids[i:i + batch_size]}
+        batch_invoices = sum(len(docs) for _, docs in batch.values())
         try:
-            push_invoice_for_customer(coll_customers, customer_id, customer_country, invoice_doc)
-            processed += 1
-            if processed % 100 == 0:
-                print(f"Inserted {processed} invoices (customer-centric)")
+            n_buckets += push_customers_batch(coll_customers, coll_buckets, batch, max_embedded)
+            processed += batch_invoices
+            print(f"Inserted {processed} invoices for {min(i + batch_size, len(customer_ids))} customers (customer-centric)")
+        except CircuitOpenError:
+            raise
         except PyMongoError as e:
-            print(f"Failed inserting invoice {invoice_no} into customer {customer_id}: {e}")
+            print(f"Failed inserting {batch_invoices} invoices for customers {customer_ids[i]}..: {e}")
 
-    print(f"Done. Inserted {processed} invoices into customer-centric collection.")
-    client.close()
+    print(f"Done. Inserted {processed} invoices into customer-centric collection ({n_buckets} overflow buckets).")
+    print(RETRY_STATS)
+    ensure_indexes(db)
+    if own_client:
+        client.close()
 
-if __name__ == "__main__":
+def main(argv=None, client=None):
+    import argparse
     import os
+    parser = argparse.ArgumentParser(description="Load invoices into the customer-centric Mongo model")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="customers per bulk_write")
+    parser.add_argument("--max-embedded", type=int, default=MAX_EMBEDDED_INVOICES,
+                        help="cap on invoices embedded per customer; overflow goes to " + BUCKET_COLLECTION)
+    parser.add_argument("--pipeline", action="store_true", help="encode in worker processes, write from threads (large loads)")
+    parser.add_argument("--encoders", type=int, default=None, help="encoder processes with --pipeline")
+    parser.add_argument("--writers", type=int, default=None, help="writer threads with --pipeline")
+    parser.add_argument("--path", default=DATA_FILE)
+    parser.add_argument("--invoices", type=int, default=None,
+                        help=f"invoices to load (default {N_INVOICES}; the whole file with --pipeline)")
+    args = parser.parse_args(argv)
     uri = os.environ.get("MONGO_URI", None)
-    run(uri)
+    run(uri, batch_size=args.batch_size, max_embedded=args.max_embedded, client=client, pipeline=args.pipeline,
+        encoders=args.encoders, writers=args.writers, path=args.path, n_invoices=args.invoices)
 
+if __name__ == "__main__":
+    main()
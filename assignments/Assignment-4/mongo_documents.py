@@ -0,0 +1,98 @@
+import numpy as np
+import pandas as pd
+
+# columns the document builders read
+DOC_COLUMNS = ['InvoiceNo', 'StockCode', 'Description', 'Quantity', 'InvoiceDate', 'UnitPrice', 'CustomerID', 'Country']
+
+def _columns(df):
+    """
+    Sort the cleaned DataFrame by InvoiceNo once and return plain Python lists per
+    column plus the [start, end) row range of every invoice.
+    NaN quantities/prices become 0 / 0.0 (same as the old per-row pd.isna checks).
+    """
+    invoice_nos = df['InvoiceNo'].astype(str).to_numpy()
+    order = np.argsort(invoice_nos, kind='stable')
+    invoice_nos = invoice_nos[order]
+
+    n = len(invoice_nos)
+    is_start = np.ones(n, dtype=bool)
+    is_start[1:] = invoice_nos[1:] != invoice_nos[:-1]
+    starts = np.flatnonzero(is_start)
+    ends = np.append(starts[1:], n)
+
+    def take(name, fill=None, dtype=None):
+        col = df[name]
+        # typed frames (typed_schema.to_typed): BSON dates / ints instead of strings
+        if dtype is None and pd.api.types.is_datetime64_any_dtype(col):
+            return col.to_numpy().astype('datetime64[us]').astype(object)[order]  # datetime / None
+        if dtype is None and pd.api.types.is_integer_dtype(col):
+            return col.astype(object).where(col.notna(), None).to_numpy()[order]
+        if fill is not None:
+            col = col.fillna(fill)
+        col = col.astype(dtype) if dtype is not None else col.astype(str)
+        return col.to_numpy()[order]
+
+    stock_codes = take('StockCode')
+    # first row of each (invoice, stock code) pair -> the product docs
+    first_product = ~pd.DataFrame({'i': invoice_nos, 's': stock_codes}).duplicated().to_numpy()
+
+    cols = {
+        'invoiceNo': invoice_nos.tolist(),
+        'stockCode': stock_codes.tolist(),
+        'description': take('Description').tolist(),
+        'quantity': take('Quantity', 0, np.int64).tolist(),
+        'unitPrice': take('UnitPrice', 0.0, np.float64).tolist(),
+        'invoiceDate': take('InvoiceDate').tolist(),
+        'customerId': take('CustomerID').tolist(),
+        'country': take('Country').tolist(),
+    }
+    return cols, starts.tolist(), ends.tolist(), np.flatnonzero(first_product)
+
+def build_transactional_bundles(df):
+    """
+    Build (header, items, customer_doc, product_docs) per invoice for the
+    transactional model, in InvoiceNo order.
+    """
+    cols, starts, ends, product_rows = _columns(df)
+    inv, code, desc = cols['invoiceNo'], cols['stockCode'], cols['description']
+    items = [
+        {"invoiceNo": i, "stockCode": s, "quantity": q, "unitPrice": p}
+        for i, s, q, p in zip(inv, code, cols['quantity'], cols['unitPrice'])
+    ]
+    product_starts = np.searchsorted(product_rows, starts).tolist()
+    product_ends = np.searchsorted(product_rows, ends).tolist()
+    product_rows = product_rows.tolist()
+
+    bundles = []
+    for start, end, p_start, p_end in zip(starts, ends, product_starts, product_ends):
+        header = {
+            "_id": inv[start],
+            "invoiceDate": cols['invoiceDate'][start],
+            "customerId": cols['customerId'][start]
+        }
+        customer_doc = {"_id": cols['customerId'][start], "country": cols['country'][start]}
+        product_docs = [
+            {"_id": code[r], "description": desc[r]} for r in product_rows[p_start:p_end]
+        ]
+        bundles.append((header, items[start:end], customer_doc, product_docs))
+    return bundles
+
+def build_customer_centric_invoices(df):
+    """
+    Build (customer_id, country, invoice_doc) per invoice for the customer-centric
+    model, in InvoiceNo order. Items carry their description.
+    """
+    cols, starts, ends, _ = _columns(df)
+    items = [
+        {"stockCode": s, "description": d, "quantity": q, "unitPrice": p}
+        for s, d, q, p in zip(cols['stockCode'], cols['description'], cols['quantity'], cols['unitPrice'])
+    ]
+    invoices = []
+    for start, end in zip(starts, ends):
+        invoice_doc = {
+            "invoiceNo": cols['invoiceNo'][start],
+            "invoiceDate": cols['invoiceDate'][start],
+            "items": items[start:end]
+        }
+        invoices.append((cols['customerId'][start], cols['country'][start], invoice_doc))
+    return invoices
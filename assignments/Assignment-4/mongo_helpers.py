@@ -1,41 +1,322 @@
-import time
 import random
+import threading
+import time
 from functools import wraps
 from pymongo import MongoClient
-from pymongo.errors import AutoReconnect, ConnectionFailure, ServerSelectionTimeoutError, OperationFailure
+from pymongo.errors import (
+    AutoReconnect, ConnectionFailure, ServerSelectionTimeoutError, OperationFailure, PyMongoError,
+)
+
+SHARED_MIN_POOL_SIZE = 4  # connections the shared client opens up front
+CONNECT_TIMINGS = {}  # last get_mongo_client call: client construction / first ping, in seconds
 
-def get_mongo_client(uri=None, max_pool_size=100, min_pool_size=0, server_selection_timeout_ms=5000, connect_timeout_ms=10000):
+_shared_clients = {}
+_shared_lock = threading.Lock()
+
+def get_mongo_client(uri=None, max_pool_size=100, min_pool_size=0, server_selection_timeout_ms=5000, connect_timeout_ms=10000,
+                     event_listeners=None, ping=True):
     
     if not uri:
         uri = "mongodb://localhost:27017"
         
+    t0 = time.perf_counter()
     client = MongoClient(
         uri,
         maxPoolSize=max_pool_size,
         minPoolSize=min_pool_size,
         serverSelectionTimeoutMS=server_selection_timeout_ms,
         connectTimeoutMS=connect_timeout_ms,
-        retryWrites=True
+        retryWrites=True,
+        event_listeners=event_listeners or []
     )
-    # Optionally: force server selection to raise early if can't connect
-    client.admin.command('ping')
+    t1 = time.perf_counter()
+    # force server selection to raise early if can't connect; callers whose first
+    # command is a round trip anyway (ping=False) skip it
+    if ping:
+        client.admin.command('ping')
+    CONNECT_TIMINGS.update(init_seconds=t1 - t0, ping_seconds=time.perf_counter() - t1 if ping else None)
     return client
 
-def retry_on_transient_errors(max_attempts=3, base_delay=0.5, backoff=2.0):
+def shared_client(uri=None, min_pool_size=SHARED_MIN_POOL_SIZE, **kwargs):
+    """
+    One pooled client per process and URI, so only the first caller pays for
+    server selection and the ping. ``minPoolSize`` makes the driver open that
+    many connections in the background straight away, which keeps the first
+    concurrent operations from each waiting on a handshake.
+    """
+    key = uri or "mongodb://localhost:27017"
+    with _shared_lock:
+        if key not in _shared_clients:
+            _shared_clients[key] = get_mongo_client(uri, min_pool_size=min_pool_size, **kwargs)
+        return _shared_clients[key]
+
+def close_shared_clients():
+    with _shared_lock:
+        for client in _shared_clients.values():
+            client.close()
+        _shared_clients.clear()
+
+# --- retries -----------------------------------------------------------------------
+# Transient = worth retrying: network errors, the server's TransientTransactionError
+# / RetryableWriteError labels, and OperationFailure codes for elections, shutdowns
+# and write conflicts. Everything else (duplicate keys, validation) fails at once.
+
+RETRYABLE_CODES = {
+    6,      # HostUnreachable
+    7,      # HostNotFound
+    89,     # NetworkTimeout
+    91,     # ShutdownInProgress
+    112,    # WriteConflict
+    189,    # PrimarySteppedDown
+    262,    # ExceededTimeLimit
+    9001,   # SocketException
+    10107,  # NotWritablePrimary
+    11600,  # InterruptedAtShutdown
+    11602,  # InterruptedDueToReplStateChange
+    13435,  # NotPrimaryNoSecondaryOk
+    13436,  # NotPrimaryOrSecondary
+}
+TRANSIENT_LABELS = ("TransientTransactionError", "RetryableWriteError")
+# transient but a sign of contention, not of an unhealthy server: never trips the breaker
+CONTENTION_CODES = {
+    112,    # WriteConflict
+    251,    # NoSuchTransaction (aborted by a conflicting transaction)
+}
+
+class CircuitOpenError(PyMongoError):
+    """Raised without contacting the server while the circuit breaker is open."""
+
+def is_transient(exc):
+    if isinstance(exc, CircuitOpenError):
+        return False
+    if isinstance(exc, (AutoReconnect, ConnectionFailure, ServerSelectionTimeoutError)):
+        return True
+    if isinstance(exc, PyMongoError) and any(exc.has_error_label(label) for label in TRANSIENT_LABELS):
+        return True
+    return isinstance(exc, OperationFailure) and exc.code in RETRYABLE_CODES
+
+def is_unavailable(exc):
+    """
+    Transient errors that say the server (or the route to it) is unhealthy:
+    network / selection failures and the election / shutdown codes. Only these
+    count toward the circuit breaker; write conflicts are expected under load.
+    """
+    if isinstance(exc, CircuitOpenError):
+        return False
+    if isinstance(exc, (AutoReconnect, ConnectionFailure, ServerSelectionTimeoutError)):
+        return True
+    return isinstance(exc, OperationFailure) and exc.code in RETRYABLE_CODES - CONTENTION_CODES
+
+def full_jitter(attempt, base_delay=0.5, backoff=2.0, max_delay=8.0):
+    """Sleep for retry ``attempt`` (1-based): uniform in [0, min(max_delay, base_delay * backoff**(attempt-1))]."""
+    return random.uniform(0, min(max_delay, base_delay * backoff ** (attempt - 1)))
+
+class RetryStats:
+    """Thread-safe counters shared by every retry loop (attempts, retries, time lost)."""
+
+    FIELDS = ("calls", "attempts", "retries", "commit_retries", "gave_up", "rejected", "failed_attempt_seconds", "sleep_seconds")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._counts = dict.fromkeys(self.FIELDS, 0)
+
+    def add(self, **deltas):
+        with self._lock:
+            for name, value in deltas.items():
+                self._counts[name] += value
+
+    def snapshot(self):
+        with self._lock:
+            counts = dict(self._counts)
+        counts["lost_seconds"] = counts["failed_attempt_seconds"] + counts["sleep_seconds"]
+        return counts
+
+    def __str__(self):
+        s = self.snapshot()
+        return (f"retries: {s['retries']} (+{s['commit_retries']} commit) over {s['attempts']} attempts / "
+                f"{s['calls']} calls, {s['gave_up']} gave up, {s['rejected']} rejected by breaker, "
+                f"{s['lost_seconds']:.2f}s lost")
+
+class CircuitBreaker:
+    """
+    Opens after ``failure_threshold`` consecutive failures (is_unavailable
+    errors, or retry loops that ran out of attempts / deadline) and then
+    rejects calls for ``reset_timeout`` seconds. After that one trial call is let
+    through (half-open): success closes the circuit, failure re-opens it.
+    Errors that say nothing about the server's health (a duplicate key, a write
+    conflict) are inconclusive: they leave the count alone and free the trial.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial = False
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            return "half-open" if time.monotonic() - self._opened_at >= self.reset_timeout else "open"
+
+    def before_call(self):
+        with self._lock:
+            if self._opened_at is None:
+                return
+            if time.monotonic() - self._opened_at >= self.reset_timeout and not self._trial:
+                self._trial = True
+                return
+        raise CircuitOpenError(f"circuit open after {self._failures} consecutive failures")
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial = False
+
+    def record_inconclusive(self):
+        with self._lock:
+            self._trial = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+            self._trial = False
+
+RETRY_STATS = RetryStats()
+BREAKER = CircuitBreaker()
+
+def retry_on_transient_errors(max_attempts=3, base_delay=0.5, backoff=2.0, max_delay=8.0, deadline=30.0,
+                              breaker=BREAKER, stats=RETRY_STATS):
+    """
+    Retry a single idempotent operation on transient errors with full-jitter
+    backoff, until ``max_attempts`` or the ``deadline`` (seconds since the first
+    attempt) would be exceeded. Not for statements inside a transaction: an
+    aborted transaction has to be retried as a whole (see run_transaction).
+    """
     def decorator(func):
         @wraps(func)
         def wrapper(*args, **kwargs):
-            delay = base_delay
-            attempts = 0
-            while attempts < max_attempts:
+            start = time.monotonic()
+            stats.add(calls=1)
+            attempt = 0
+            while True:
+                attempt += 1
+                if breaker is not None:
+                    try:
+                        breaker.before_call()
+                    except CircuitOpenError:
+                        stats.add(rejected=1)
+                        raise
+                stats.add(attempts=1)
+                t0 = time.monotonic()
                 try:
-                    return func(*args, **kwargs)
-                except (AutoReconnect, ConnectionFailure, ServerSelectionTimeoutError) as ex:
-                    attempts += 1
-                    if attempts >= max_attempts:
+                    result = func(*args, **kwargs)
+                except PyMongoError as ex:
+                    if not is_transient(ex):
+                        if breaker is not None:
+                            breaker.record_inconclusive()
+                        raise
+                    stats.add(failed_attempt_seconds=time.monotonic() - t0)
+                    delay = full_jitter(attempt, base_delay, backoff, max_delay)
+                    gave_up = attempt >= max_attempts or time.monotonic() - start + delay > deadline
+                    if breaker is not None:
+                        breaker.record_failure() if is_unavailable(ex) or gave_up else breaker.record_inconclusive()
+                    if gave_up:
+                        stats.add(gave_up=1)
                         raise
+                    stats.add(retries=1, sleep_seconds=delay)
                     time.sleep(delay)
-                    delay *= backoff
+                    continue
+                if breaker is not None:
+                    breaker.record_success()
+                return result
         return wrapper
     return decorator
 
+def run_transaction(client, callback, deadline=120.0, base_delay=0.05, backoff=2.0, max_delay=2.0,
+                    breaker=BREAKER, stats=RETRY_STATS, **transaction_options):
+    """
+    Run ``callback(session)`` in a transaction with ClientSession.with_transaction
+    semantics: the whole transaction is retried on TransientTransactionError and
+    the commit alone on UnknownTransactionCommitResult, both until ``deadline``
+    seconds have passed (120 s, like the driver). Unlike with_transaction it
+    sleeps with full jitter between attempts, goes through the circuit breaker
+    and records RETRY_STATS. ``callback`` must only do work inside the
+    transaction, since it may run more than once.
+    """
+    start = time.monotonic()
+    stats.add(calls=1)
+    attempt = 0
+
+    def within_deadline(delay=0.0):
+        return time.monotonic() - start + delay < deadline
+
+    def failed(ex, t0, retrying):
+        # write conflicts are contention, not an outage; only a transient error we
+        # give up on (deadline) or an unreachable server counts toward the breaker
+        stats.add(failed_attempt_seconds=time.monotonic() - t0)
+        if breaker is not None:
+            if is_unavailable(ex) or (is_transient(ex) and not retrying):
+                breaker.record_failure()
+            else:
+                breaker.record_inconclusive()
+
+    with client.start_session() as session:
+        while True:
+            attempt += 1
+            if breaker is not None:
+                try:
+                    breaker.before_call()
+                except CircuitOpenError:
+                    stats.add(rejected=1)
+                    raise
+            stats.add(attempts=1)
+            t0 = time.monotonic()
+            session.start_transaction(**transaction_options)
+            try:
+                result = callback(session)
+            except Exception as ex:
+                if session.in_transaction:
+                    session.abort_transaction()
+                if not isinstance(ex, PyMongoError):
+                    raise
+                delay = full_jitter(attempt, base_delay, backoff, max_delay)
+                retrying = ex.has_error_label("TransientTransactionError") and within_deadline(delay)
+                failed(ex, t0, retrying)
+                if retrying:
+                    stats.add(retries=1, sleep_seconds=delay)
+                    time.sleep(delay)
+                    continue
+                stats.add(gave_up=is_transient(ex))
+                raise
+
+            while True:
+                try:
+                    session.commit_transaction()
+                except PyMongoError as ex:
+                    if ex.has_error_label("UnknownTransactionCommitResult") and within_deadline() \
+                            and not (isinstance(ex, OperationFailure) and ex.code == 50):  # MaxTimeMSExpired
+                        stats.add(commit_retries=1)
+                        continue
+                    delay = full_jitter(attempt, base_delay, backoff, max_delay)
+                    retrying = ex.has_error_label("TransientTransactionError") and within_deadline(delay)
+                    failed(ex, t0, retrying)
+                    if retrying:
+                        stats.add(retries=1, sleep_seconds=delay)
+                        time.sleep(delay)
+                        break
+                    stats.add(gave_up=is_transient(ex))
+                    raise
+                if breaker is not None:
+                    breaker.record_success()
+                return result
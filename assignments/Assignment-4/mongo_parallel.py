@@ -0,0 +1,171 @@
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from pymongo.errors import PyMongoError
+from mongo_helpers import get_mongo_client, RETRY_STATS, CircuitOpenError
+from mongo_indexes import ensure_indexes
+from mongo_documents import build_transactional_bundles, build_customer_centric_invoices
+import mongo_transactional
+import mongo_customer_centric
+
+N_WORKERS = 8
+BATCH_SIZE = 100  # invoices (tx) or customers (cc) per batch
+MAX_IN_FLIGHT = 16  # batches running at once (at most one per partition)
+
+def partition(items, n_partitions, key):
+    """
+    Split items into n non-overlapping partitions by a stable hash of key(item).
+    parallel_ingest writes each partition from one task, so every invoice of a
+    customer (or every write to a customer document) is handled by one worker.
+    """
+    parts = [[] for _ in range(n_partitions)]
+    for item in items:
+        parts[zlib.crc32(str(key(item)).encode()) % n_partitions].append(item)
+    return [p for p in parts if p]
+
+def _percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(round(q * (len(sorted_values) - 1))))]
+
+def parallel_ingest(partitions, write_batch, batch_size=BATCH_SIZE, workers=N_WORKERS, max_in_flight=MAX_IN_FLIGHT):
+    """
+    Run write_batch(batch) -> n_written over every partition on a thread pool.
+    Each partition is one task that writes its batches one after another, so a
+    partition never has two batches in flight and its documents are only ever
+    written by one worker at a time. All workers share the caller's (pooled)
+    client through write_batch; at most ``max_in_flight`` batches run at once.
+    An open circuit breaker stops every partition at its next batch and is
+    re-raised, rather than counting every remaining batch as failed.
+    Returns a throughput/latency summary.
+    """
+    in_flight = threading.BoundedSemaphore(max_in_flight)
+    lock = threading.Lock()
+    latencies = []
+    totals = {"batches": 0, "written": 0, "failed_batches": 0}
+    stop = threading.Event()
+
+    def write_one(batch):
+        t0 = time.perf_counter()
+        try:
+            written = write_batch(batch)
+            with lock:
+                totals["written"] += written
+        except CircuitOpenError:
+            stop.set()
+            raise
+        except PyMongoError as e:
+            with lock:
+                totals["failed_batches"] += 1
+            print(f"Batch of {len(batch)} failed: {e}")
+        finally:
+            with lock:
+                totals["batches"] += 1
+                latencies.append(time.perf_counter() - t0)
+
+    def task(part):
+        for offset in range(0, len(part), batch_size):
+            if stop.is_set():
+                return
+            with in_flight:
+                write_one(part[offset:offset + batch_size])
+
+    t_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(task, part) for part in partitions if part]
+    elapsed = time.perf_counter() - t_start
+    for future in futures:
+        future.result()  # surface unexpected (non-Mongo) errors and an open breaker
+
+    latencies.sort()
+    summary = dict(
+        totals,
+        workers=workers,
+        seconds=elapsed,
+        throughput=totals["written"] / elapsed if elapsed else 0.0,
+        p50_ms=_percentile(latencies, 0.50) * 1000,
+        p95_ms=_percentile(latencies, 0.95) * 1000,
+        max_ms=(latencies[-1] if latencies else 0.0) * 1000,
+    )
+    print(
+        f"{summary['written']} written in {elapsed:.2f}s ({summary['throughput']:,.0f}/s) by {workers} workers; "
+        f"batch latency p50 {summary['p50_ms']:.1f}ms p95 {summary['p95_ms']:.1f}ms max {summary['max_ms']:.1f}ms; "
+        f"{summary['failed_batches']} failed batches"
+    )
+    return summary
+
+def run_transactional(uri=None, client=None, workers=N_WORKERS, batch_size=BATCH_SIZE, max_in_flight=MAX_IN_FLIGHT):
+    """
+    Parallel version of mongo_transactional.run, partitioned by customer. Each
+    partition's batches run one at a time, and products are upserted up front,
+    so concurrent transactions write disjoint documents.
+    """
+    own_client = client is None
+    if own_client:
+        client = get_mongo_client(uri, max_pool_size=max(100, workers))
+    db = client["online_retail"]
+
+    df = mongo_transactional.load_csv(mongo_transactional.N_INVOICES)
+    bundles = build_transactional_bundles(df)[:mongo_transactional.N_INVOICES]
+    # customers are disjoint per partition; products are shared by all of them, so
+    # they are upserted once up front instead of in every worker's transactions
+    mongo_transactional.upsert_products(db, (doc for bundle in bundles for doc in bundle[3]))
+    partitions = partition(bundles, workers, key=lambda bundle: bundle[0]["customerId"])
+
+    def write_batch(batch):
+        try:
+            # retried as a whole transaction inside insert_invoice_batch
+            mongo_transactional.insert_invoice_batch(client, db, batch, products=False)
+            return len(batch)
+        except CircuitOpenError:
+            raise
+        except PyMongoError:
+            return mongo_transactional.insert_invoices_individually(client, db, batch, products=False)
+
+    summary = parallel_ingest(partitions, write_batch, batch_size, workers, max_in_flight)
+    summary["index_timings"] = ensure_indexes(db)
+    summary["retries"] = RETRY_STATS.snapshot()
+    if own_client:
+        client.close()
+    return summary
+
+def run_customer_centric(uri=None, client=None, workers=N_WORKERS, batch_size=BATCH_SIZE,
+                         max_in_flight=MAX_IN_FLIGHT, max_embedded=mongo_customer_centric.MAX_EMBEDDED_INVOICES):
+    """Parallel version of mongo_customer_centric.run; each customer belongs to one partition."""
+    own_client = client is None
+    if own_client:
+        client = get_mongo_client(uri, max_pool_size=max(100, workers))
+    db = client["online_retail"]
+    coll_customers = db.get_collection("customers_cc")
+    coll_buckets = db.get_collection(mongo_customer_centric.BUCKET_COLLECTION)
+
+    df = mongo_customer_centric.load_csv(mongo_customer_centric.N_INVOICES)
+    invoices = build_customer_centric_invoices(df)[:mongo_customer_centric.N_INVOICES]
+    customers = mongo_customer_centric.group_by_customer(invoices)
+    partitions = partition(customers.items(), workers, key=lambda entry: entry[0])
+
+    def write_batch(batch):
+        # push_customers_batch retries transient errors itself, skipping invoices already written
+        mongo_customer_centric.push_customers_batch(coll_customers, coll_buckets, dict(batch), max_embedded)
+        return sum(len(docs) for _, (_, docs) in batch)
+
+    summary = parallel_ingest(partitions, write_batch, batch_size, workers, max_in_flight)
+    summary["index_timings"] = ensure_indexes(db)
+    summary["retries"] = RETRY_STATS.snapshot()
+    if own_client:
+        client.close()
+    return summary
+
+if __name__ == "__main__":
+    import argparse
+    import os
+    parser = argparse.ArgumentParser(description="Parallel Mongo ingestion over a shared connection pool")
+    parser.add_argument("model", choices=["tx", "cc"], help="transactional or customer-centric model")
+    parser.add_argument("--workers", type=int, default=N_WORKERS)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--max-in-flight", type=int, default=MAX_IN_FLIGHT)
+    args = parser.parse_args()
+    uri = os.environ.get("MONGO_URI", None)
+    runner = run_transactional if args.model == "tx" else run_customer_centric
+    runner(uri, workers=args.workers, batch_size=args.batch_size, max_in_flight=args.max_in_flight)
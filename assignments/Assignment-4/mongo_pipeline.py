@@ -0,0 +1,348 @@
+# Pipelined Mongo ingestion for large loads, in three stages joined by bounded
+# queues (a slow stage stalls the ones before it instead of growing memory):
+#
+#   reader   (main thread)  raw CSV bytes, cut on invoice boundaries
+#   encoders (processes)    parse, clean, build the documents, BSON-encode them
+#   writers  (threads)      wrap the bytes in RawBSONDocument and ship them
+#
+# pymongo copies a RawBSONDocument's bytes straight into the wire message, also
+# when it is nested in a $push/$each, so the interpreter that owns the client
+# never builds or encodes the big documents; what is left for it is network I/O
+# and the small customer/product upserts. Every stage records how long it sat
+# blocked on its neighbours (PipelineStats), which names the bottleneck.
+import multiprocessing
+import os
+import queue
+import threading
+import time
+import zlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import bson
+from bson import ObjectId
+from bson.raw_bson import RawBSONDocument
+from pymongo.errors import PyMongoError
+import dataset
+from mongo_helpers import get_mongo_client, RETRY_STATS, CircuitOpenError
+from mongo_indexes import ensure_indexes
+from mongo_documents import build_transactional_bundles, build_customer_centric_invoices
+import mongo_transactional
+import mongo_customer_centric
+
+DATA_FILE = "online_retail.csv"
+CHUNK_ROWS = 20_000  # CSV lines per encoder task (extended to the end of the last invoice)
+N_ENCODERS = max(1, (os.cpu_count() or 2) - 1)  # leave a core for the reader and the writers
+N_WRITERS = 4
+BATCH_SIZE = 100  # invoices (tx) or invoices grouped by customer (cc) per write
+QUEUE_BATCHES = 32  # encoded batches buffered per writer queue
+CHUNKS_IN_FLIGHT = 2  # encoder tasks submitted per encoder process
+
+# --- encoders (run in worker processes) ----------------------------------------------
+
+def _clean(data):
+    return dataset.parse_raw(data).dropna(subset=dataset.REQUIRED_COLUMNS)
+
+def encode_transactional(data):
+    """
+    CSV chunk -> [(customer_id, header_bson, [item_bson, ...], customer_doc, product_docs)]
+    per invoice. Items get their ObjectId here, as insert_many would have done.
+    Returns (units, cpu_seconds, encoded_bytes).
+    """
+    t0 = time.process_time()
+    units = []
+    size = 0
+    for header, items, customer_doc, product_docs in build_transactional_bundles(_clean(data)):
+        header_bson = bson.encode(header)
+        items_bson = [bson.encode(dict(item, _id=ObjectId())) for item in items]
+        size += len(header_bson) + sum(map(len, items_bson))
+        units.append((header["customerId"], header_bson, items_bson, customer_doc, product_docs))
+    return units, time.process_time() - t0, size
+
+def encode_customer_centric(data):
+    """CSV chunk -> [(customer_id, country, invoice_bson)] per invoice; see encode_transactional."""
+    t0 = time.process_time()
+    units = []
+    size = 0
+    for customer_id, country, invoice_doc in build_customer_centric_invoices(_clean(data)):
+        invoice_bson = bson.encode(invoice_doc)
+        size += len(invoice_bson)
+        units.append((customer_id, country, invoice_bson))
+    return units, time.process_time() - t0, size
+
+# --- writers -------------------------------------------------------------------------
+
+def write_transactional(client, db, units):
+    """
+    One transaction per batch; a failed batch is retried invoice by invoice.
+    Products were already upserted by the dispatcher (see ingest).
+    """
+    bundles = [
+        (RawBSONDocument(header), [RawBSONDocument(item) for item in items], customer_doc, product_docs)
+        for _, header, items, customer_doc, product_docs in units
+    ]
+    try:
+        mongo_transactional.insert_invoice_batch(client, db, bundles, products=False)
+        return len(bundles)
+    except CircuitOpenError:
+        raise
+    except PyMongoError as e:
+        print(f"Batch of {len(bundles)} invoices failed ({type(e).__name__}); retrying per invoice")
+        return mongo_transactional.insert_invoices_individually(client, db, bundles, products=False)
+
+def write_customer_centric(db, units, max_embedded=None):
+    customers = mongo_customer_centric.group_by_customer(
+        (customer_id, country, RawBSONDocument(invoice)) for customer_id, country, invoice in units
+    )
+    # push_customers_batch retries transient errors itself, skipping invoices already written
+    mongo_customer_centric.push_customers_batch(
+        db.get_collection("customers_cc"), db.get_collection(mongo_customer_centric.BUCKET_COLLECTION),
+        customers, max_embedded
+    )
+    return len(units)
+
+# --- stats ---------------------------------------------------------------------------
+
+class PipelineStats:
+    """
+    Where each stage spent its time. Rules of thumb: writers idle while the
+    dispatcher waits on encoders -> add encoders; dispatcher blocked on full
+    queues -> the database (or the writer count) is the limit.
+    """
+
+    def __init__(self, n_writers):
+        self._lock = threading.Lock()
+        self.reader = {"chunks": 0, "bytes": 0, "read_s": 0.0, "wait_encoders_s": 0.0, "upsert_products_s": 0.0}
+        self.encoders = {"chunks": 0, "invoices": 0, "cpu_s": 0.0, "encoded_bytes": 0}
+        self.queues = {"batches": 0, "put_blocked_s": 0.0, "max_depth": 0, "depth_sum": 0}
+        self.writers = [
+            {"batches": 0, "invoices": 0, "busy_s": 0.0, "idle_s": 0.0, "failed_batches": 0} for _ in range(n_writers)
+        ]
+
+    def add_writer(self, i, **deltas):
+        with self._lock:
+            for name, value in deltas.items():
+                self.writers[i][name] += value
+
+    def summary(self, seconds):
+        with self._lock:
+            writers = [dict(w) for w in self.writers]
+        written = sum(w["invoices"] for w in writers)
+        q = self.queues
+        return {
+            "seconds": seconds,
+            "invoices": written,
+            "throughput": written / seconds if seconds else 0.0,
+            "reader": dict(self.reader),
+            "encoders": dict(self.encoders),
+            "queues": dict(q, mean_depth=q["depth_sum"] / q["batches"] if q["batches"] else 0.0),
+            "writers": writers,
+        }
+
+def print_stats(summary, n_encoders):
+    r, e, q, ws = summary["reader"], summary["encoders"], summary["queues"], summary["writers"]
+    seconds = summary["seconds"] or 1.0
+    print(f"{summary['invoices']} invoices in {summary['seconds']:.2f}s ({summary['throughput']:,.0f}/s)")
+    print(f"  reader   {r['chunks']} chunks, {r['bytes'] / 1e6:.1f} MB CSV, read {r['read_s']:.2f}s, "
+          f"waiting on encoders {r['wait_encoders_s']:.2f}s, product upserts {r['upsert_products_s']:.2f}s")
+    print(f"  encoders {n_encoders} procs, {e['invoices']} invoices, {e['encoded_bytes'] / 1e6:.1f} MB BSON, "
+          f"cpu {e['cpu_s']:.2f}s ({e['cpu_s'] / seconds / n_encoders:.0%} of their wall time)")
+    print(f"  queues   {q['batches']} batches, put blocked {q['put_blocked_s']:.2f}s, "
+          f"depth mean {q['mean_depth']:.1f} max {q['max_depth']}")
+    for i, w in enumerate(ws):
+        print(f"  writer {i} {w['batches']} batches, {w['invoices']} invoices, busy {w['busy_s']:.2f}s, "
+              f"idle {w['idle_s']:.2f}s, {w['failed_batches']} failed batches")
+
+# --- pipeline ------------------------------------------------------------------------
+
+def ingest(model, client, path=DATA_FILE, n_invoices=None, batch_size=BATCH_SIZE, encoders=N_ENCODERS,
+           writers=N_WRITERS, chunk_rows=CHUNK_ROWS, queue_batches=QUEUE_BATCHES, max_embedded=None):
+    """
+    Load ``path`` (or its first ``n_invoices`` invoices) into the "tx" or "cc"
+    model through the encoder processes and writer threads. Batches are routed
+    to writers by customer, so a customer's invoices are written by one writer,
+    in CSV order, and concurrent writers touch disjoint customer documents. The
+    products shared by all transactional batches are upserted by the dispatcher,
+    once per new product, before any batch using them is queued.
+    ``n_invoices`` and the reported count are invoices the writers confirmed as
+    written: invoices a batch fails to write are replaced from later chunks.
+    Returns the PipelineStats summary.
+    """
+    db = client["online_retail"]
+    encode = encode_transactional if model == "tx" else encode_customer_centric
+    if model == "tx":
+        write = lambda units: write_transactional(client, db, units)
+    else:
+        write = lambda units: write_customer_centric(db, units, max_embedded)
+    queues = [queue.Queue(queue_batches) for _ in range(writers)]
+    seen_products = set()
+    stats = PipelineStats(writers)
+    failed = []
+    # invoices whose batch a writer has finished ("settled"), and how many of those it wrote
+    progress = threading.Condition()
+    done = {"settled": 0, "written": 0}
+
+    def writer(i):
+        q = queues[i]
+        while True:
+            t0 = time.perf_counter()
+            units = q.get()
+            t1 = time.perf_counter()
+            if units is None:
+                stats.add_writer(i, idle_s=t1 - t0)
+                return
+            written = 0
+            try:
+                if not failed:  # after a crash, only drain so the dispatcher cannot block
+                    written = write(units)
+                    stats.add_writer(i, batches=1, invoices=written, failed_batches=written < len(units))
+            except CircuitOpenError as e:
+                failed.append(e)  # stop the load instead of dropping every remaining batch
+            except PyMongoError as e:
+                print(f"Batch of {len(units)} invoices failed: {e}")
+                stats.add_writer(i, batches=1, failed_batches=1)
+            except Exception as e:
+                failed.append(e)
+            finally:
+                with progress:
+                    done["settled"] += len(units)
+                    done["written"] += written
+                    progress.notify_all()
+            stats.add_writer(i, idle_s=t1 - t0, busy_s=time.perf_counter() - t1)
+
+    def put(route, units):
+        q = queues[route]
+        t0 = time.perf_counter()
+        q.put(units)
+        stats.queues["put_blocked_s"] += time.perf_counter() - t0
+        depth = q.qsize()
+        stats.queues["batches"] += 1
+        stats.queues["depth_sum"] += depth
+        stats.queues["max_depth"] = max(stats.queues["max_depth"], depth)
+
+    threads = [threading.Thread(target=writer, args=(i,), name=f"writer-{i}", daemon=True) for i in range(writers)]
+    for t in threads:
+        t.start()
+
+    pending = [[] for _ in queues]  # units not yet making a full batch, per queue
+    backlog = deque()  # encoded units held back by the n_invoices limit
+    dispatched = 0
+
+    def needed():
+        """Invoices still to dispatch for n_invoices, if every outstanding one gets written."""
+        with progress:
+            lost = done["settled"] - done["written"]
+        return n_invoices - dispatched + lost
+
+    def complete():
+        with progress:
+            return n_invoices is not None and done["written"] >= n_invoices
+
+    def dispatch(units):
+        nonlocal dispatched
+        dispatched += len(units)
+        if model == "tx":
+            new_products = [doc for unit in units for doc in unit[4] if doc["_id"] not in seen_products]
+            if new_products:
+                t0 = time.perf_counter()
+                mongo_transactional.upsert_products(db, new_products)
+                seen_products.update(doc["_id"] for doc in new_products)
+                stats.reader["upsert_products_s"] += time.perf_counter() - t0
+        for unit in units:
+            route = zlib.crc32(str(unit[0]).encode()) % len(queues)
+            pending[route].append(unit)
+            if len(pending[route]) >= batch_size:
+                put(route, pending[route])
+                pending[route] = []
+
+    def flush():
+        for route, units in enumerate(pending):
+            if units:
+                put(route, units)
+                pending[route] = []
+
+    def feed():
+        n = len(backlog) if n_invoices is None else min(len(backlog), max(0, needed()))
+        if n:
+            dispatch([backlog.popleft() for _ in range(n)])
+
+    def collect(future):
+        t0 = time.perf_counter()
+        units, cpu_s, size = future.result()
+        stats.reader["wait_encoders_s"] += time.perf_counter() - t0
+        stats.encoders["chunks"] += 1
+        stats.encoders["invoices"] += len(units)
+        stats.encoders["cpu_s"] += cpu_s
+        stats.encoders["encoded_bytes"] += size
+        backlog.extend(units)
+
+    t_start = time.perf_counter()
+    # spawn, not fork: the parent already runs the driver's monitor threads
+    with ProcessPoolExecutor(encoders, mp_context=multiprocessing.get_context("spawn")) as pool:
+        in_flight = deque()
+        chunks = dataset.iter_raw_chunks(path, 0, chunk_rows, include_partial=True)
+        exhausted = False
+        while not failed and not complete():
+            feed()
+            if n_invoices is not None and needed() <= 0:
+                # n_invoices counts written invoices: wait for the outstanding batches,
+                # and dispatch replacements for any they fail to write
+                flush()
+                with progress:
+                    progress.wait_for(lambda: failed or needed() > 0 or complete())
+                continue
+            if not exhausted:
+                t0 = time.perf_counter()
+                data = next(chunks, None)
+                stats.reader["read_s"] += time.perf_counter() - t0
+                if data is None:
+                    exhausted = True
+                    continue
+                stats.reader["chunks"] += 1
+                stats.reader["bytes"] += len(data[0])
+                in_flight.append(pool.submit(encode, data[0]))
+                if len(in_flight) >= encoders * CHUNKS_IN_FLIGHT:
+                    collect(in_flight.popleft())
+            elif in_flight:
+                collect(in_flight.popleft())
+            else:
+                break
+        for future in in_flight:
+            future.cancel()
+    flush()
+    for q in queues:
+        q.put(None)
+    for t in threads:
+        t.join()
+    if failed:
+        raise failed[0]
+
+    summary = stats.summary(time.perf_counter() - t_start)
+    print_stats(summary, encoders)
+    summary["index_timings"] = ensure_indexes(db)
+    summary["retries"] = RETRY_STATS.snapshot()
+    print(RETRY_STATS)
+    return summary
+
+def run(model, uri=None, client=None, **kwargs):
+    own_client = client is None
+    if own_client:
+        client = get_mongo_client(uri, max_pool_size=max(100, kwargs.get("writers", N_WRITERS)))
+    try:
+        return ingest(model, client, **kwargs)
+    finally:
+        if own_client:
+            client.close()
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Pipelined Mongo ingestion: encoder processes + writer threads")
+    parser.add_argument("model", choices=["tx", "cc"], help="transactional or customer-centric model")
+    parser.add_argument("--path", default=DATA_FILE)
+    parser.add_argument("--invoices", type=int, default=None, help="stop after this many invoices (default: whole file)")
+    parser.add_argument("--encoders", type=int, default=N_ENCODERS)
+    parser.add_argument("--writers", type=int, default=N_WRITERS)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    args = parser.parse_args()
+    run(args.model, os.environ.get("MONGO_URI", None), path=args.path, n_invoices=args.invoices,
+        batch_size=args.batch_size, encoders=args.encoders, writers=args.writers, chunk_rows=args.chunk_rows)
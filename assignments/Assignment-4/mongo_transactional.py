@@ -1,17 +1,19 @@
-import pandas as pd
-from pymongo import WriteConcern
+from pymongo import UpdateOne, WriteConcern
 from pymongo.errors import PyMongoError
-from mongo_helpers import get_mongo_client, retry_on_transient_errors
+from mongo_helpers import get_mongo_client, run_transaction, retry_on_transient_errors, RETRY_STATS, CircuitOpenError
+from mongo_indexes import ensure_indexes
+import dataset
+from mongo_documents import DOC_COLUMNS, build_transactional_bundles
+import itertools
 import os
 
 DATA_FILE = "online_retail.csv"
 N_INVOICES = 1000  # number of invoices to ingest (min)
 
-def load_csv(n_rows):
-    df = pd.read_csv(DATA_FILE, encoding='unicode_escape', nrows=n_rows*3)  # overfetch slightly
-    return df
+def load_csv(n_rows, path=DATA_FILE):
+    # cleaned rows among the first n_rows*3 CSV rows (overfetch slightly), from the shared cache
+    return dataset.load(columns=DOC_COLUMNS, nrows=n_rows*3, path=path)
 
-@retry_on_transient_errors()
 def upsert_product(coll_products, product_doc, session=None):
     coll_products.update_one(
         {"_id": product_doc["_id"]},
@@ -20,7 +22,6 @@ def upsert_product(coll_products, product_doc, session=None):
         session=session
     )
 
-@retry_on_transient_errors()
 def upsert_customer(coll_customers, customer_doc, session=None):
     coll_customers.update_one(
         {"_id": customer_doc["_id"]},
@@ -29,72 +30,178 @@ def upsert_customer(coll_customers, customer_doc, session=None):
         session=session
     )
 
-def run(uri=None):
-    client = get_mongo_client(uri)
+@retry_on_transient_errors()
+def upsert_products(db, product_docs):
+    """
+    Upsert ``product_docs`` (first description per _id wins) in one unordered
+    bulk_write, outside any transaction (idempotent $set, so safe to retry).
+    Parallel writers do this up front and pass products=False below: hot products
+    are in most invoices, and upserting them inside concurrent transactions only
+    produces WriteConflicts.
+    """
+    products = {}
+    for product_doc in product_docs:
+        products.setdefault(product_doc["_id"], product_doc["description"])
+    if products:
+        db.products.bulk_write(
+            [UpdateOne({"_id": code}, {"$set": {"description": desc}}, upsert=True) for code, desc in products.items()],
+            ordered=False
+        )
+    return len(products)
+
+def insert_invoice(client, db, bundle, products=True):
+    """
+    Insert one invoice (customer/product upserts + header + items) in its own
+    transaction, retried as a whole on transient errors by run_transaction.
+    ``products=False`` skips the product upserts (see upsert_products).
+    """
+    invoice_header, items_docs, customer_doc, product_docs = bundle
+
+    def write(session):
+        # upsert customer
+        upsert_customer(db.customers, customer_doc, session=session)
+        # upsert all products for this invoice
+        for product_doc in product_docs if products else ():
+            upsert_product(db.products, product_doc, session=session)
+        # insert invoice header
+        db.invoices.insert_one(invoice_header, session=session)
+        # insert items
+        db.invoice_items.insert_many(items_docs, ordered=True, session=session)
+
+    run_transaction(client, write)
+
+def insert_invoice_batch(client, db, bundles, products=True):
+    """
+    Insert many invoices in a single transaction: customers and products are
+    deduplicated across the batch and sent with one bulk_write each, headers and
+    items with one insert_many each. Transient failures retry the whole transaction.
+    ``products=False`` skips the product upserts (see upsert_products).
+    """
+    customers = {}
+    product_descriptions = {}
+    headers = []
+    items = []
+    for invoice_header, items_docs, customer_doc, product_docs in bundles:
+        customers[customer_doc["_id"]] = customer_doc["country"]
+        for product_doc in product_docs if products else ():
+            product_descriptions.setdefault(product_doc["_id"], product_doc["description"])
+        headers.append(invoice_header)
+        items.extend(items_docs)
+
+    def write(session):
+        db.customers.bulk_write(
+            [UpdateOne({"_id": cid}, {"$set": {"country": country}}, upsert=True) for cid, country in customers.items()],
+            ordered=False,
+            session=session
+        )
+        if product_descriptions:
+            db.products.bulk_write(
+                [UpdateOne({"_id": code}, {"$set": {"description": desc}}, upsert=True)
+                 for code, desc in product_descriptions.items()],
+                ordered=False,
+                session=session
+            )
+        db.invoices.insert_many(headers, ordered=False, session=session)
+        db.invoice_items.insert_many(items, ordered=False, session=session)
+
+    run_transaction(client, write)
+
+def insert_invoices_individually(client, db, bundles, products=True):
+    """
+    Fallback for a failed batch: retry each invoice in its own transaction.
+    An open circuit breaker is re-raised rather than logged per invoice.
+    """
+    inserted = 0
+    for bundle in bundles:
+        try:
+            insert_invoice(client, db, bundle, products)
+            inserted += 1
+        except CircuitOpenError:
+            raise
+        except PyMongoError as e:
+            print(f"Failed to insert invoice {bundle[0]['_id']}: {e}")
+    return inserted
+
+def run(uri=None, batch_size=1, client=None, pipeline=False, encoders=None, writers=None, path=DATA_FILE,
+        n_invoices=None):
+    """
+    Load ``n_invoices`` invoices from ``path`` (default N_INVOICES; with
+    ``pipeline`` the whole file). ``batch_size`` invoices share one transaction;
+    batch_size=1 keeps the original one-transaction-per-invoice behaviour.
+    ``pipeline`` hands the load to mongo_pipeline (encoder processes + writer threads).
+    A passed-in ``client`` (e.g. the CLI's shared one) is left open.
+    """
+    own_client = client is None
+    if own_client:
+        client = get_mongo_client(uri)
     print(client)
     db = client["online_retail"]
-    coll_customers = db.get_collection("customers")
-    coll_products = db.get_collection("products")
-    coll_invoices = db.get_collection("invoices")
-    coll_invoice_items = db.get_collection("invoice_items")
+
+    if pipeline:
+        import mongo_pipeline
+        mongo_pipeline.ingest("tx", client, path, n_invoices, batch_size,
+                              encoders=encoders or mongo_pipeline.N_ENCODERS, writers=writers or mongo_pipeline.N_WRITERS)
+        if own_client:
+            client.close()
+        return
 
     # set write concern for transactional safety if desired
-    # coll_invoices = coll_invoices.with_options(write_concern=WriteConcern("majority"))
+    # db = client.get_database("online_retail", write_concern=WriteConcern("majority"))
 
-    df = load_csv(N_INVOICES)
-    # drop rows lacking required keys
-    df = df.dropna(subset=['InvoiceNo', 'CustomerID', 'StockCode', 'Description'])
+    n_invoices = n_invoices or N_INVOICES
+    # rows lacking required keys are already dropped by the dataset cache
+    df = load_csv(n_invoices, path)
 
-    # Group rows by InvoiceNo -> each invoice will contain multiple line items
-    grouped = df.groupby('InvoiceNo')
+    # One (header, items, customer, products) bundle per InvoiceNo
+    bundles = build_transactional_bundles(df)
     processed = 0
+    remaining = iter(bundles)
 
-    for invoice_no, group in grouped:
-        if processed >= N_INVOICES:
-            break
-
-        invoice_header = {
-            "_id": str(invoice_no),
-            "invoiceDate": str(group['InvoiceDate'].iloc[0]),
-            "customerId": str(group['CustomerID'].iloc[0])
-        }
-
-        items_docs = []
-        # create items docs
-        for _, row in group.iterrows():
-            item = {
-                "invoiceNo": str(invoice_no),
-                "stockCode": str(row['StockCode']),
-                "quantity": int(row['Quantity']) if not pd.isna(row['Quantity']) else 0,
-                "unitPrice": float(row['UnitPrice']) if not pd.isna(row['UnitPrice']) else 0.0
-            }
-            items_docs.append(item)
-        # products and customer upserts + invoice + items insertion in a transaction
+    def flush(batch):
+        """Write ``batch``; returns how many of its invoices were actually inserted."""
+        if batch_size == 1:
+            return insert_invoices_individually(client, db, batch)
         try:
-            with client.start_session() as session:
-                # start transaction
-                with session.start_transaction():
-                    # upsert customer
-                    upsert_customer(coll_customers, {"_id": invoice_header["customerId"], "country": str(group['Country'].iloc[0])}, session=session)
-                    # upsert all products for this invoice
-                    for it in items_docs:
-                        upsert_product(coll_products, {"_id": it["stockCode"], "description": str(group[group['StockCode'] == it["stockCode"]]['Description'].iloc[0])}, session=session)
-                    # insert invoice header
-                    coll_invoices.insert_one(invoice_header, session=session)
-                    # insert items
-                    coll_invoice_items.insert_many(items_docs, ordered=True, session=session)
-            processed += 1
-            if processed % 100 == 0:
-                print(f"Inserted {processed} invoices (transactional)")
+            insert_invoice_batch(client, db, batch)
+            return len(batch)
+        except CircuitOpenError:
+            raise
         except PyMongoError as e:
-            print(f"Failed to insert invoice {invoice_no}: {e}")
-            # transaction will abort on exception; continue with next invoice
+            # transaction aborted as a whole; isolate the bad invoice(s)
+            print(f"Batch of {len(batch)} invoices failed ({type(e).__name__}); retrying per invoice")
+            return insert_invoices_individually(client, db, batch)
+
+    # only inserted invoices count toward n_invoices: dropped ones are replaced
+    # by the next bundles, and a batch never asks for more than is still missing
+    while processed < n_invoices:
+        batch = list(itertools.islice(remaining, min(batch_size, n_invoices - processed)))
+        if not batch:
+            break
+        before = processed
+        processed += flush(batch)
+        if processed // 100 > before // 100:
+            print(f"Inserted {processed} invoices (transactional)")
 
     print(f"Done. Inserted {processed} transactional invoices.")
-    client.close()
+    print(RETRY_STATS)
+    ensure_indexes(db)
+    if own_client:
+        client.close()
 
-if __name__ == "__main__":
-    import os
+def main(argv=None, client=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="Load invoices into the transactional Mongo model")
+    parser.add_argument("--batch-size", type=int, default=1, help="invoices per transaction (1 = per-invoice)")
+    parser.add_argument("--pipeline", action="store_true", help="encode in worker processes, write from threads (large loads)")
+    parser.add_argument("--encoders", type=int, default=None, help="encoder processes with --pipeline")
+    parser.add_argument("--writers", type=int, default=None, help="writer threads with --pipeline")
+    parser.add_argument("--path", default=DATA_FILE)
+    parser.add_argument("--invoices", type=int, default=None,
+                        help=f"invoices to load (default {N_INVOICES}; the whole file with --pipeline)")
+    args = parser.parse_args(argv)
     uri = os.environ.get("MONGO_URI", None)
-    run(uri=uri)
+    run(uri=uri, batch_size=args.batch_size, client=client, pipeline=args.pipeline, encoders=args.encoders,
+        writers=args.writers, path=args.path, n_invoices=args.invoices)
 
+if __name__ == "__main__":
+    main()
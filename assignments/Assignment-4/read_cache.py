@@ -0,0 +1,109 @@
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+MAX_BYTES = 64 * 1024 * 1024
+TTL = 60.0  # seconds; bounds staleness from writers that bypass invalidation
+
+def deep_size(obj, _seen=None):
+    """Approximate memory footprint of rows / documents (sys.getsizeof over containers)."""
+    if _seen is None:
+        _seen = set()
+    if id(obj) in _seen:
+        return 0
+    _seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_size(k, _seen) + deep_size(v, _seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(deep_size(item, _seen) for item in obj)
+    return size
+
+class ReadThroughCache:
+    """
+    Thread-safe LRU cache bounded by total (approximate) bytes, with a TTL per
+    entry. Keys are tuples whose first two items name the lookup, e.g.
+    ("mongo_cc", "customer", customer_id); hits and misses are counted per such
+    namespace. Cached values are shared between callers and must not be mutated.
+    """
+
+    def __init__(self, max_bytes=MAX_BYTES, ttl=TTL, sizeof=deep_size):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.sizeof = sizeof
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (value, size, expires_at), oldest first
+        self.bytes = 0
+        self._version = 0  # bumped by every invalidation
+        self.reset_stats()
+
+    def reset_stats(self):
+        with self._lock:
+            self.counts = {"evictions": 0, "expirations": 0, "invalidations": 0, "uncacheable": 0}
+            self.lookups = {}  # namespace -> [hits, misses]
+
+    def _count(self, key, hit):
+        self.lookups.setdefault(key[:2], [0, 0])[0 if hit else 1] += 1
+
+    def _drop(self, key):
+        _, size, _ = self._entries.pop(key)
+        self.bytes -= size
+
+    def get_or_load(self, key, loader):
+        """Cached value for ``key``, or ``loader()``'s result (which is then cached)."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[2] > now:
+                    self._entries.move_to_end(key)
+                    self._count(key, True)
+                    return entry[0]
+                self._drop(key)
+                self.counts["expirations"] += 1
+            self._count(key, False)
+            version = self._version
+        value = loader()
+        self.put(key, value, version)
+        return value
+
+    def put(self, key, value, version=None):
+        """
+        Cache ``value``. With ``version`` (taken before loading it) the value is
+        dropped if anything was invalidated meanwhile, since it may predate that write.
+        """
+        size = self.sizeof(value)
+        with self._lock:
+            if version is not None and version != self._version:
+                return
+            if key in self._entries:
+                self._drop(key)
+            if size > self.max_bytes:
+                self.counts["uncacheable"] += 1
+                return
+            self._entries[key] = (value, size, time.monotonic() + self.ttl)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self.counts["evictions"] += 1
+
+    def invalidate(self, key):
+        with self._lock:
+            self._version += 1
+            if key in self._entries:
+                self._drop(key)
+                self.counts["invalidations"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self):
+        with self._lock:
+            per_namespace = {
+                ":".join(map(str, ns)): {"hits": h, "misses": m, "hit_rate": h / (h + m) if h + m else 0.0}
+                for ns, (h, m) in self.lookups.items()
+            }
+            return dict(self.counts, entries=len(self._entries), bytes=self.bytes, lookups=per_namespace)
@@ -0,0 +1,92 @@
+# Standard library only, so opening a DAO (e.g. in every loadgen worker) does not
+# import pandas / pymongo.
+import sqlite3
+import time
+
+DB_NAME = "online_retail.db"  # Q1.DB_NAME
+DATE_FORMAT = "%m/%d/%Y %H:%M"  # InvoiceDate in the CSV, e.g. 12/1/2010 8:26; typed_schema parses it
+
+CACHED_STATEMENTS = 256  # sqlite3 default is 128 prepared statements per connection
+
+# Every statement the benchmark issues. Executing the same SQL text on the same
+# connection hits sqlite3's prepared-statement cache instead of re-parsing.
+STATEMENTS = {
+    "read_invoice": (
+        "SELECT Invoice.InvoiceNo, Invoice.InvoiceDate, Invoice.CustomerID, InvoiceItem.StockCode, "
+        "InvoiceItem.Quantity, InvoiceItem.UnitPrice FROM Invoice LEFT JOIN InvoiceItem "
+        "ON Invoice.InvoiceNo = InvoiceItem.InvoiceNo WHERE Invoice.InvoiceNo = ?"
+    ),
+    "read_customer": (
+        "SELECT Customer.CustomerID, Customer.Country, Invoice.InvoiceNo, Invoice.InvoiceDate, "
+        "InvoiceItem.StockCode, InvoiceItem.Quantity, InvoiceItem.UnitPrice FROM Customer "
+        "LEFT JOIN Invoice ON Invoice.CustomerID = Customer.CustomerID "
+        "LEFT JOIN InvoiceItem ON InvoiceItem.InvoiceNo = Invoice.InvoiceNo WHERE Customer.CustomerID = ?"
+    ),
+    "insert_invoice": "INSERT OR IGNORE INTO Invoice (InvoiceNo, InvoiceDate, CustomerID) VALUES (?, ?, '0')",
+    "insert_item": "INSERT OR IGNORE INTO InvoiceItem (InvoiceNo, StockCode, Quantity, UnitPrice) VALUES (?, 'SAMPLE', 1, 1.0)",
+    "update_item": "UPDATE InvoiceItem SET Quantity = Quantity + 1 WHERE InvoiceNo = ?",
+    "delete_items": "DELETE FROM InvoiceItem WHERE InvoiceNo = ?",
+    "delete_invoice": "DELETE FROM Invoice WHERE InvoiceNo = ?",
+}
+
+class SQLiteDAO:
+    """
+    One long-lived connection (and cursor) for all benchmark operations, with a
+    larger prepared-statement cache. Opening runs no DDL: callers provision the
+    indexes once (Q1.create_secondary_indexes) before opening DAOs, e.g. one per
+    loadgen worker. With a read_cache.ReadThroughCache as
+    ``cache``, read_invoice goes through it and the write methods invalidate it.
+    """
+
+    def __init__(self, path=DB_NAME, cached_statements=CACHED_STATEMENTS, timeout=5.0, cache=None):
+        self.conn = sqlite3.connect(path, cached_statements=cached_statements, timeout=timeout)
+        self.cur = self.conn.cursor()
+        self.cache = cache
+
+    def _query_invoice(self, invoice_no):
+        return self.cur.execute(STATEMENTS["read_invoice"], (invoice_no,)).fetchall()
+
+    def read_invoice(self, invoice_no):
+        if self.cache is None:
+            return self._query_invoice(invoice_no)
+        return self.cache.get_or_load(("sqlite", "invoice", invoice_no), lambda: self._query_invoice(invoice_no))
+
+    def _invalidate(self, invoice_no):
+        if self.cache is not None:
+            self.cache.invalidate(("sqlite", "invoice", invoice_no))
+
+    def read_customer(self, customer_id):
+        return self.cur.execute(STATEMENTS["read_customer"], (customer_id,)).fetchall()
+
+    def insert_invoice(self, invoice_no):
+        # same InvoiceDate format as the CSV and the Mongo bench writes, so date ranges match
+        self.cur.execute(STATEMENTS["insert_invoice"], (invoice_no, time.strftime(DATE_FORMAT)))
+        self.cur.execute(STATEMENTS["insert_item"], (invoice_no,))
+        self.conn.commit()
+        self._invalidate(invoice_no)
+
+    def update_items(self, invoice_no):
+        self.cur.execute(STATEMENTS["update_item"], (invoice_no,))
+        self.conn.commit()
+        self._invalidate(invoice_no)
+
+    def delete_invoice(self, invoice_no):
+        self.cur.execute(STATEMENTS["delete_items"], (invoice_no,))
+        self.cur.execute(STATEMENTS["delete_invoice"], (invoice_no,))
+        self.conn.commit()
+        self._invalidate(invoice_no)
+
+    def explain(self, name, params):
+        """EXPLAIN QUERY PLAN detail lines for one statement."""
+        rows = self.conn.execute("EXPLAIN QUERY PLAN " + STATEMENTS[name], params).fetchall()
+        return [row[-1] for row in rows]
+
+    def explain_all(self, invoice_no, customer_id):
+        """Plans for every benchmarked statement, keyed by statement name."""
+        params = {name: (invoice_no,) for name in STATEMENTS}
+        params["read_customer"] = (customer_id,)
+        params["insert_invoice"] = (invoice_no, time.strftime(DATE_FORMAT))
+        return {name: self.explain(name, params[name]) for name in STATEMENTS}
+
+    def close(self):
+        self.conn.close()
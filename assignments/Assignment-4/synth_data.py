@@ -0,0 +1,138 @@
+# Deterministic synthetic data in the online_retail.csv schema, for scale tests
+# (1M-50M line items) of the loaders and the Q3 benchmark.
+#
+# Skew: customer and product popularity are Zipfian, a handful of whale
+# customers place a fixed share of all invoices with bigger baskets, items per
+# invoice are geometric. Rows are produced in blocks of invoices with NumPy and
+# appended to the CSV, so memory stays constant whatever the row count; the
+# same arguments always produce the same file.
+import datetime as dt
+import time
+import numpy as np
+import pandas as pd
+from dataset import COLUMNS
+
+OUT_FILE = "synthetic_retail.csv"
+N_ROWS = 1_000_000  # line items
+N_CUSTOMERS = 20_000
+N_PRODUCTS = 4_000
+CUSTOMER_ZIPF_S = 1.1
+PRODUCT_ZIPF_S = 1.0
+N_WHALES = 5  # customers that each place WHALE_SHARE / N_WHALES of all invoices
+WHALE_SHARE = 0.05
+WHALE_BASKET_FACTOR = 4  # whale baskets are this many times larger on average
+MEAN_ITEMS = 20  # mean line items per (non-whale) invoice
+CANCEL_RATE = 0.02  # invoices with a "C" prefix and negative quantities
+MISSING_CUSTOMER_RATE = 0.0  # blank CustomerID, dropped by the loaders' cleaning
+FIRST_INVOICE = 536365
+START = dt.datetime(2010, 12, 1, 8, 0)
+INVOICES_PER_MINUTE = 2.0  # mean arrival rate; dates only move forward
+BLOCK_INVOICES = 20_000  # ~0.5M rows per block; bounds memory
+SEED = 42
+COUNTRIES = ["United Kingdom", "Germany", "France", "EIRE", "Spain", "Netherlands", "Belgium", "Switzerland",
+             "Portugal", "Australia"]
+HOME_COUNTRY_SHARE = 0.9
+
+def zipf_cdf(n, s):
+    """Cumulative probabilities of ranks 1..n under a finite Zipf(s) law."""
+    weights = 1.0 / np.arange(1, n + 1) ** s
+    cdf = np.cumsum(weights)
+    return cdf / cdf[-1]
+
+def sample_ranks(rng, cdf, size):
+    return np.minimum(np.searchsorted(cdf, rng.random(size), side="right"), len(cdf) - 1)
+
+def _catalogue(rng, n_customers, n_products):
+    """
+    Fixed per-entity attributes, already rendered as CSV fragments; popularity
+    rank -> id is a random permutation.
+    """
+    # formatted like the export ("17850.0")
+    customer_ids = np.array([f"{c}.0" for c in 12346 + rng.permutation(n_customers)], dtype=object)
+    foreign = rng.random(n_customers) >= HOME_COUNTRY_SHARE
+    country_idx = np.where(foreign, rng.integers(1, len(COUNTRIES), n_customers), 0)
+    countries = np.array(COUNTRIES, dtype=object)[country_idx]
+    codes = 10002 + rng.permutation(n_products)
+    prices = np.round(np.exp(rng.normal(0.7, 0.8, n_products)), 2).clip(0.1, 500.0)
+    # StockCode,"Description",  and  UnitPrice,
+    product_head = np.array([f'{c},"ITEM, {c}",' for c in codes], dtype=object)
+    product_price = np.array([f"{p:.2f}," for p in prices], dtype=object)
+    return customer_ids, countries, product_head, product_price
+
+def _format_dates(minutes):
+    """Minutes since START -> 'M/D/YYYY H:MM' like the real export."""
+    ts = pd.Series(pd.Timestamp(START) + pd.to_timedelta(minutes, unit="min"))
+    return (ts.dt.month.astype(str) + "/" + ts.dt.day.astype(str) + "/" + ts.dt.year.astype(str) + " "
+            + ts.dt.hour.astype(str) + ":" + ts.dt.minute.astype(str).str.zfill(2)).to_numpy()
+
+def generate(path=OUT_FILE, n_rows=N_ROWS, n_customers=N_CUSTOMERS, n_products=N_PRODUCTS, seed=SEED,
+             customer_zipf_s=CUSTOMER_ZIPF_S, product_zipf_s=PRODUCT_ZIPF_S, n_whales=N_WHALES,
+             block_invoices=BLOCK_INVOICES):
+    """Write ``n_rows`` line items (whole invoices, grouped by InvoiceNo) to ``path``."""
+    rng = np.random.default_rng(seed)
+    customer_ids, countries, product_head, product_price = _catalogue(rng, n_customers, n_products)
+    customer_cdf = zipf_cdf(n_customers, customer_zipf_s)
+    product_cdf = zipf_cdf(n_products, product_zipf_s)
+    whales = rng.choice(n_customers, n_whales, replace=False) if n_whales else np.array([], dtype=np.int64)
+
+    written = 0
+    next_invoice = FIRST_INVOICE
+    clock = 0.0  # minutes since START
+    t0 = time.perf_counter()
+    with open(path, "w", newline="") as f:
+        f.write(",".join(COLUMNS) + "\n")
+        while written < n_rows:
+            # --- one block of invoices -------------------------------------------------
+            n_inv = block_invoices
+            is_whale = rng.random(n_inv) < WHALE_SHARE if n_whales else np.zeros(n_inv, dtype=bool)
+            customer_rank = sample_ranks(rng, customer_cdf, n_inv)
+            customer_rank[is_whale] = whales[rng.integers(0, n_whales, is_whale.sum())]
+            mean_items = np.where(is_whale, MEAN_ITEMS * WHALE_BASKET_FACTOR, MEAN_ITEMS)
+            sizes = rng.geometric(1.0 / mean_items)
+            ends = np.cumsum(sizes)
+            if written + ends[-1] >= n_rows:  # last block: stop at the invoice that reaches n_rows
+                n_inv = int(np.searchsorted(ends, n_rows - written)) + 1
+                sizes, customer_rank, ends = sizes[:n_inv], customer_rank[:n_inv], ends[:n_inv]
+            cancelled = rng.random(n_inv) < CANCEL_RATE
+            missing = rng.random(n_inv) < MISSING_CUSTOMER_RATE
+            minutes = clock + np.cumsum(rng.exponential(1.0 / INVOICES_PER_MINUTE, n_inv))
+            clock = float(minutes[-1])
+
+            # per-invoice fragments: "InvoiceNo,"  ",InvoiceDate,"  "CustomerID,Country\n"
+            invoice_nos = np.arange(next_invoice, next_invoice + n_inv).astype(str).astype(object)
+            invoice_nos[cancelled] = "C" + invoice_nos[cancelled]
+            next_invoice += n_inv
+            customers = customer_ids[customer_rank]
+            customers[missing] = ""
+            invoice_head = invoice_nos + ","
+            invoice_date = "," + _format_dates(minutes).astype(object) + ","
+            invoice_tail = customers + "," + countries[customer_rank] + "\n"
+
+            # --- expand to line items; each row is five string concatenations ---------
+            n = int(ends[-1])
+            row_invoice = np.repeat(np.arange(n_inv), sizes)
+            product = sample_ranks(rng, product_cdf, n)
+            quantity = rng.geometric(0.15, n)
+            quantity[cancelled[row_invoice]] *= -1
+            rows = (invoice_head[row_invoice] + product_head[product] + quantity.astype(str).astype(object)
+                    + invoice_date[row_invoice] + product_price[product] + invoice_tail[row_invoice])
+            f.write("".join(rows))
+            written += n
+            elapsed = time.perf_counter() - t0
+            print(f"{written:,} rows, {next_invoice - FIRST_INVOICE:,} invoices ({written / elapsed:,.0f} rows/sec)")
+    return written
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Generate a synthetic online_retail.csv-shaped file")
+    parser.add_argument("--rows", type=int, default=N_ROWS, help="line items to write (rounded up to whole invoices)")
+    parser.add_argument("--customers", type=int, default=N_CUSTOMERS)
+    parser.add_argument("--products", type=int, default=N_PRODUCTS)
+    parser.add_argument("--customer-zipf", type=float, default=CUSTOMER_ZIPF_S, help="Zipf exponent of customer popularity")
+    parser.add_argument("--product-zipf", type=float, default=PRODUCT_ZIPF_S, help="Zipf exponent of product popularity")
+    parser.add_argument("--whales", type=int, default=N_WHALES, help="customers sharing WHALE_SHARE of all invoices")
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--out", default=OUT_FILE)
+    args = parser.parse_args()
+    generate(args.out, args.rows, args.customers, args.products, args.seed, args.customer_zipf, args.product_zipf,
+             args.whales)
@@ -0,0 +1,51 @@
+# Resume tests for incremental's checkpointing, against the SQLite target only
+# (no MongoDB needed).  python -m pytest -q
+import sqlite3
+import incremental
+
+HEADER = "InvoiceNo,StockCode,Description,Quantity,InvoiceDate,UnitPrice,CustomerID,Country\n"
+
+def _row(invoice_no, stock_code="85123A", customer_id="17850.0"):
+    return f"{invoice_no},{stock_code},ITEM {stock_code},6,12/1/2010 8:26,2.55,{customer_id},United Kingdom\n"
+
+def _items(db_path, invoice_no):
+    conn = sqlite3.connect(db_path)
+    n = conn.execute("SELECT count(*) FROM InvoiceItem WHERE InvoiceNo = ?", (invoice_no,)).fetchone()[0]
+    conn.close()
+    return n
+
+def test_resume_keeps_appended_rows_with_lower_invoice_numbers(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # checkpoints and the commands CSV land here
+    csv_path, db_path = str(tmp_path / "retail.csv"), str(tmp_path / "retail.db")
+    with open(csv_path, "w") as f:
+        f.write(HEADER + "".join(_row(no) for no in ["536365", "536366", "536367", "536380"]))
+    assert incremental.ingest_sqlite(csv_path, db_path, chunk_rows=2) == 4
+
+    # a late cancellation and an out-of-order invoice, both below max_invoice
+    with open(csv_path, "a") as f:
+        f.write(_row("C536379") + _row("536370", "22752") + _row("536381"))
+    assert incremental.ingest_sqlite(csv_path, db_path, chunk_rows=2) == 3
+    assert _items(db_path, "C536379") == 1
+    assert _items(db_path, "536370") == 1
+    assert _items(db_path, "536381") == 1
+    assert incremental.ingest_sqlite(csv_path, db_path, chunk_rows=2) == 0
+
+def test_rewritten_file_skips_loaded_invoices_then_accepts_appends(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    csv_path, db_path = str(tmp_path / "retail.csv"), str(tmp_path / "retail.db")
+    with open(csv_path, "w") as f:
+        f.write(HEADER + _row("536365") + _row("536366"))
+    incremental.ingest_sqlite(csv_path, db_path, chunk_rows=1)
+
+    # rewritten from the top: the loaded invoices come back, plus a new one
+    with open(csv_path, "w") as f:
+        f.write(HEADER + _row("536360") + _row("536365") + _row("536366") + _row("536368"))
+    incremental.ingest_sqlite(csv_path, db_path, chunk_rows=1)
+    assert _items(db_path, "536360") == 0  # at or below the old max_invoice: taken as loaded
+    assert _items(db_path, "536368") == 1
+    assert not incremental.load_checkpoint("sqlite", csv_path)["rewritten"]
+
+    with open(csv_path, "a") as f:
+        f.write(_row("C536361"))
+    incremental.ingest_sqlite(csv_path, db_path, chunk_rows=1)
+    assert _items(db_path, "C536361") == 1
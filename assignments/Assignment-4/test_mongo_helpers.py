@@ -0,0 +1,173 @@
+# In-process tests of mongo_helpers' circuit breaker and retry loops; the
+# "server" is a fake that raises pymongo errors, so no MongoDB is needed.
+# python -m pytest -q
+import random
+import time
+import pytest
+from pymongo.errors import AutoReconnect, OperationFailure
+from mongo_helpers import (
+    CircuitBreaker, CircuitOpenError, RetryStats, full_jitter, retry_on_transient_errors, run_transaction,
+)
+
+RESET = 0.05  # breaker reset_timeout in these tests, seconds
+
+def _write_conflict():
+    return OperationFailure("WriteConflict", 112, {"errorLabels": ["TransientTransactionError"]})
+
+def _duplicate_key():
+    return OperationFailure("E11000 duplicate key", 11000)
+
+class FakeServer:
+    """Callable that raises the queued errors in turn, then answers."""
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def __call__(self, *args):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return "ok"
+
+def _guarded(server, breaker, max_attempts=1, stats=None):
+    retry = retry_on_transient_errors(max_attempts=max_attempts, base_delay=0.0, breaker=breaker,
+                                      stats=stats or RetryStats())
+    return retry(server)
+
+def test_breaker_opens_after_consecutive_unavailable_errors():
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=RESET)
+    server = FakeServer(*[AutoReconnect("down")] * 3)
+    call = _guarded(server, breaker)
+    for _ in range(3):
+        with pytest.raises(AutoReconnect):
+            call()
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        call()
+    assert server.calls == 3  # rejected without reaching the server
+
+def test_half_open_trial_success_closes_and_failure_reopens():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=RESET)
+    server = FakeServer(AutoReconnect("down"), AutoReconnect("still down"))
+    call = _guarded(server, breaker)
+    with pytest.raises(AutoReconnect):
+        call()
+    time.sleep(RESET * 1.5)
+    assert breaker.state == "half-open"
+    with pytest.raises(AutoReconnect):
+        call()  # the trial fails: open again for a full reset_timeout
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        call()
+    time.sleep(RESET * 1.5)
+    assert call() == "ok"
+    assert breaker.state == "closed"
+
+def test_half_open_lets_one_trial_through():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=RESET)
+    breaker.record_failure()
+    time.sleep(RESET * 1.5)
+    breaker.before_call()  # the trial
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()  # everyone else waits for its outcome
+
+def test_non_transient_errors_leave_the_breaker_unchanged():
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=RESET)
+    server = FakeServer(AutoReconnect("down"), AutoReconnect("down"), _duplicate_key(), AutoReconnect("down"))
+    call = _guarded(server, breaker)
+    for error in (AutoReconnect, AutoReconnect, OperationFailure):
+        with pytest.raises(error):
+            call()
+    assert breaker.state == "closed"
+    with pytest.raises(AutoReconnect):
+        call()  # the duplicate key did not reset the count: third failure in a row
+    assert breaker.state == "open"
+
+def test_non_transient_error_frees_the_half_open_trial():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=RESET)
+    server = FakeServer(AutoReconnect("down"), _duplicate_key())
+    call = _guarded(server, breaker)
+    with pytest.raises(AutoReconnect):
+        call()
+    time.sleep(RESET * 1.5)
+    with pytest.raises(OperationFailure):
+        call()
+    assert breaker.state == "half-open"  # not closed by it, and the next call is the new trial
+    assert call() == "ok"
+    assert breaker.state == "closed"
+
+def test_write_conflicts_are_retried_without_tripping_the_breaker():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=RESET)
+    stats = RetryStats()
+    server = FakeServer(_write_conflict(), _write_conflict())
+    assert _guarded(server, breaker, max_attempts=3, stats=stats)() == "ok"
+    assert breaker.state == "closed"
+    counts = stats.snapshot()
+    assert (counts["attempts"], counts["retries"], counts["gave_up"]) == (3, 2, 0)
+
+def test_exhausted_retries_count_as_one_failure():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=RESET)
+    stats = RetryStats()
+    server = FakeServer(*[_write_conflict()] * 3)
+    with pytest.raises(OperationFailure):
+        _guarded(server, breaker, max_attempts=3, stats=stats)()
+    assert stats.snapshot()["gave_up"] == 1
+    assert breaker.state == "open"
+
+def test_full_jitter_stays_within_the_capped_exponential_bound():
+    random.seed(7)
+    for attempt in range(1, 8):
+        bound = min(8.0, 0.5 * 2.0 ** (attempt - 1))
+        delays = [full_jitter(attempt) for _ in range(200)]
+        assert all(0.0 <= d <= bound for d in delays)
+        assert max(delays) > bound / 2  # spread over the range, not pinned to the base
+
+class FakeSession:
+    def __init__(self):
+        self.in_transaction = False
+        self.commits = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def start_transaction(self, **options):
+        self.in_transaction = True
+
+    def abort_transaction(self):
+        self.in_transaction = False
+
+    def commit_transaction(self):
+        self.in_transaction = False
+        self.commits += 1
+
+class FakeClient:
+    def __init__(self):
+        self.session = FakeSession()
+
+    def start_session(self):
+        return self.session
+
+def test_run_transaction_retries_conflicts_and_keeps_the_breaker_closed():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=RESET)
+    client = FakeClient()
+    server = FakeServer(_write_conflict(), _write_conflict())
+    assert run_transaction(client, server, base_delay=0.0, breaker=breaker, stats=RetryStats()) == "ok"
+    assert server.calls == 3 and client.session.commits == 1
+    assert breaker.state == "closed"
+
+def _labelled(error):
+    error._add_error_label("TransientTransactionError")
+    return error
+
+def test_run_transaction_counts_unreachable_server_and_stops_at_open_breaker():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=RESET)
+    server = FakeServer(*[_labelled(AutoReconnect("down")) for _ in range(5)])
+    with pytest.raises(CircuitOpenError):
+        # the first attempt and its retry each count; the third attempt is rejected
+        run_transaction(FakeClient(), server, base_delay=0.0, breaker=breaker, stats=RetryStats())
+    assert server.calls == 2
+    assert breaker.state == "open"
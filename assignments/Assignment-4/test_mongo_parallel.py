@@ -0,0 +1,98 @@
+# In-process tests of mongo_parallel's partitioning and worker pool; write_batch
+# is a plain function here, so no MongoDB is needed.  python -m pytest -q
+import threading
+import time
+import pytest
+from pymongo.errors import OperationFailure
+from mongo_helpers import CircuitOpenError
+from mongo_parallel import partition, parallel_ingest
+
+def _items(n, customers=7):
+    return [{"customerId": f"C{i % customers}", "n": i} for i in range(n)]
+
+def test_partition_is_disjoint_complete_and_keyed():
+    items = _items(200)
+    parts = partition(items, 4, key=lambda item: item["customerId"])
+    assert sorted(item["n"] for part in parts for item in part) == list(range(200))
+    owner = {}
+    for i, part in enumerate(parts):
+        for item in part:
+            assert owner.setdefault(item["customerId"], i) == i  # one partition per customer
+    # stable across calls (crc32, not the per-process str hash) and order-preserving
+    assert parts == partition(items, 4, key=lambda item: item["customerId"])
+    for part in parts:
+        assert [item["n"] for item in part] == sorted(item["n"] for item in part)
+
+def test_partition_drops_empty_partitions():
+    parts = partition(_items(10, customers=1), 8, key=lambda item: item["customerId"])
+    assert len(parts) == 1 and len(parts[0]) == 10
+
+def test_parallel_ingest_writes_every_item_once_within_limits():
+    parts = partition(_items(500), 4, key=lambda item: item["customerId"])
+    lock = threading.Lock()
+    written, active, peak = [], [0], [0]
+
+    def write_batch(batch):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.001)
+        with lock:
+            active[0] -= 1
+            written.extend(item["n"] for item in batch)
+        assert len(batch) <= 16
+        return len(batch)
+
+    summary = parallel_ingest(parts, write_batch, batch_size=16, workers=4, max_in_flight=3)
+    assert sorted(written) == list(range(500))
+    assert summary["written"] == 500 and summary["failed_batches"] == 0
+    assert peak[0] <= 3
+
+def test_parallel_ingest_runs_one_batch_per_partition_at_a_time():
+    parts = partition(_items(600, customers=20), 3, key=lambda item: item["customerId"])
+    owner = {item["customerId"]: i for i, part in enumerate(parts) for item in part}
+    lock = threading.Lock()
+    active, peak = [0] * len(parts), [0] * len(parts)
+    overall = [0, 0]
+
+    def write_batch(batch):
+        i = owner[batch[0]["customerId"]]
+        with lock:
+            active[i] += 1
+            overall[0] += 1
+            peak[i] = max(peak[i], active[i])
+            overall[1] = max(overall[1], overall[0])
+        time.sleep(0.002)
+        with lock:
+            active[i] -= 1
+            overall[0] -= 1
+        return len(batch)
+
+    summary = parallel_ingest(parts, write_batch, batch_size=10, workers=8, max_in_flight=8)
+    assert summary["written"] == 600
+    assert peak == [1] * len(parts)  # never two batches of one partition in flight
+    assert overall[1] > 1  # partitions still ran in parallel
+
+def test_parallel_ingest_counts_failed_batches():
+    parts = partition(_items(100), 2, key=lambda item: item["customerId"])
+
+    def write_batch(batch):
+        if any(item["n"] == 42 for item in batch):
+            raise OperationFailure("duplicate", 11000)
+        return len(batch)
+
+    summary = parallel_ingest(parts, write_batch, batch_size=10, workers=2, max_in_flight=4)
+    assert summary["failed_batches"] == 1
+    assert summary["written"] + 10 >= 100 > summary["written"]
+
+def test_parallel_ingest_raises_and_stops_on_open_breaker():
+    parts = partition(_items(1000), 2, key=lambda item: item["customerId"])
+    calls = []
+
+    def write_batch(batch):
+        calls.append(len(batch))
+        raise CircuitOpenError("circuit open")
+
+    with pytest.raises(CircuitOpenError):
+        parallel_ingest(parts, write_batch, batch_size=10, workers=2, max_in_flight=2)
+    assert len(calls) < 100  # stopped submitting instead of failing every batch
@@ -0,0 +1,250 @@
+# Typed storage layout, next to the original string-typed one:
+#   - InvoiceDate: integer epoch seconds in SQLite, BSON datetime in Mongo
+#   - CustomerID: integer (17850 instead of "17850.0")
+#   - Country / StockCode / Description: pandas category during ingest
+# It lives in its own SQLite file / Mongo database so both layouts can be loaded
+# side by side and compared (storage size, ingest memory, date-range queries).
+import datetime as dt
+import os
+import random
+import sqlite3
+import time
+import tracemalloc
+import pandas as pd
+import dataset
+from Q1 import DATA_FILE, DB_NAME, CHUNK_SIZE, setup_db, insert_chunk
+from mongo_documents import DOC_COLUMNS, build_transactional_bundles, build_customer_centric_invoices
+from mongo_indexes import ensure_indexes
+from sqlite_dao import DATE_FORMAT  # InvoiceDate in the CSV and in benchmark inserts
+
+TYPED_DB_NAME = "online_retail_typed.db"
+MONGO_DB = "online_retail"
+TYPED_MONGO_DB = "online_retail_typed"
+TYPED_TABLES = ["Customer", "Product", "Invoice", "InvoiceItem"]
+CATEGORY_COLUMNS = ["Country", "StockCode", "Description"]
+# only useful once dates are comparable values
+SQLITE_INDEXES = ["CREATE INDEX IF NOT EXISTS idx_invoice_date ON Invoice (InvoiceDate)"]
+MONGO_INDEXES = {"invoices": "invoiceDate", "customers_cc": "invoices.invoiceDate"}
+DATE_RANGE_DAYS = 7
+FIRST_DAY, LAST_DAY = dt.datetime(2010, 12, 1), dt.datetime(2011, 12, 10)  # span of online_retail.csv
+
+def to_typed(df):
+    """Typed copy of a cleaned dataset frame (dates as datetime64, ids as int, text as category)."""
+    out = df.copy()
+    if "InvoiceDate" in out:
+        out["InvoiceDate"] = pd.to_datetime(out["InvoiceDate"], format=DATE_FORMAT, errors="coerce")
+    if "CustomerID" in out:
+        ids = pd.to_numeric(out["CustomerID"], errors="coerce")
+        out["CustomerID"] = ids.astype("int64") if ids.notna().all() else ids.astype("Int64")
+    for name in CATEGORY_COLUMNS:
+        if name in out:
+            out[name] = out[name].astype("category")
+    return out
+
+def epoch_seconds(dates):
+    return (dates - pd.Timestamp(0)) // pd.Timedelta(seconds=1)
+
+def _sql_frame(typed):
+    """Typed frame -> values sqlite3 can bind (epoch ints for the datetime column)."""
+    out = typed.copy()
+    out["InvoiceDate"] = epoch_seconds(out["InvoiceDate"]).astype("Int64").astype(object).where(out["InvoiceDate"].notna(), None)
+    return out
+
+# --- loading -----------------------------------------------------------------------
+
+def load_sqlite(db_path=TYPED_DB_NAME, chunk_size=CHUNK_SIZE, path=DATA_FILE):
+    """Stream the whole CSV into the typed SQLite layout; returns row counts and timing."""
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA foreign_keys = ON")
+    setup_db(conn, typed=True)
+    for ddl in SQLITE_INDEXES:
+        conn.execute(ddl)
+    seen = {"customers": set(), "products": set(), "invoices": set()}
+    totals = {"rows": 0, "items": 0}
+    t0 = time.perf_counter()
+    for chunk in dataset.iter_chunks(chunk_size=chunk_size, path=path):
+        counts = insert_chunk(conn, _sql_frame(to_typed(chunk)), seen)
+        totals["rows"] += len(chunk)
+        totals["items"] += counts["items"]
+    totals["seconds"] = time.perf_counter() - t0
+    conn.close()
+    print(f"Typed SQLite: {totals['items']} items from {totals['rows']} rows in {totals['seconds']:.2f}s -> {db_path}")
+    return totals
+
+def load_mongo(client, n_invoices=None, batch_size=100, db_name=TYPED_MONGO_DB):
+    """Load both Mongo models into ``db_name`` with datetime dates and integer customer ids."""
+    import mongo_transactional
+    import mongo_customer_centric
+    db = client[db_name]
+    df = to_typed(dataset.load(columns=DOC_COLUMNS, nrows=n_invoices * 3 if n_invoices else None))
+    bundles = build_transactional_bundles(df)[:n_invoices]
+    for i in range(0, len(bundles), batch_size):
+        mongo_transactional.insert_invoice_batch(client, db, bundles[i:i + batch_size])
+    customers = mongo_customer_centric.group_by_customer(build_customer_centric_invoices(df)[:n_invoices])
+    ids = list(customers)
+    for i in range(0, len(ids), mongo_customer_centric.BATCH_SIZE):
+        batch = {cid: customers[cid] for cid in ids[i:i + mongo_customer_centric.BATCH_SIZE]}
+        mongo_customer_centric.push_customers_batch(db.customers_cc, db[mongo_customer_centric.BUCKET_COLLECTION], batch)
+    ensure_indexes(db)
+    for coll_name, field in MONGO_INDEXES.items():
+        db[coll_name].create_index(field)
+    print(f"Typed Mongo: {len(bundles)} invoices, {len(customers)} customers -> {db_name}")
+    return len(bundles)
+
+# --- date-range queries --------------------------------------------------------------
+# The string layout has no sortable date, so both string variants rebuild a
+# YYYYMMDD integer from "M/D/YYYY H:MM" per row (a full scan); the typed layouts
+# compare native values through an index.
+
+def day_key(day):
+    return day.year * 10000 + day.month * 100 + day.day
+
+_SQL_DAY_KEY = (
+    "CAST(substr(r, instr(r, '/') + 1) AS INTEGER) * 10000 + CAST(InvoiceDate AS INTEGER) * 100 + CAST(r AS INTEGER)"
+)
+DATE_RANGE_SQL = {
+    "text": (
+        "SELECT InvoiceNo FROM (SELECT InvoiceNo, InvoiceDate, substr(InvoiceDate, instr(InvoiceDate, '/') + 1) AS r "
+        f"FROM Invoice WHERE InvoiceDate LIKE '%/%/%') WHERE {_SQL_DAY_KEY} >= ? AND {_SQL_DAY_KEY} < ?"
+    ),
+    "typed": "SELECT InvoiceNo FROM Invoice WHERE InvoiceDate >= ? AND InvoiceDate < ?",
+}
+
+def _mongo_day_key(field):
+    part = lambda i: {"$toInt": {"$substrCP": [{"$arrayElemAt": ["$$p", i]}, 0, 4 if i == 2 else 2]}}
+    return {"$let": {"vars": {"p": {"$split": [field, "/"]}}, "in": {"$cond": [
+        {"$eq": [{"$size": "$$p"}, 3]},
+        {"$add": [{"$multiply": [part(2), 10000]}, {"$multiply": [part(0), 100]}, part(1)]},
+        None,
+    ]}}}
+
+def connect_sqlite(db_path=TYPED_DB_NAME):
+    """
+    Connection to an already loaded typed DB. sqlite3.connect would silently
+    create an empty file, so a missing file or table fails here with a hint.
+    """
+    hint = "run `python typed_schema.py load-sqlite` first"
+    if not os.path.exists(db_path):
+        raise FileNotFoundError(f"typed SQLite DB {db_path} not found; {hint}")
+    conn = sqlite3.connect(db_path)
+    tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    missing = [name for name in TYPED_TABLES if name not in tables]
+    if missing:
+        conn.close()
+        raise FileNotFoundError(f"typed SQLite DB {db_path} is missing table(s) {', '.join(missing)}; {hint}")
+    return conn
+
+def sqlite_date_range(conn, start, end, typed=False):
+    """Invoice numbers dated in [start, end) (datetimes)."""
+    if typed:
+        params = (int(start.replace(tzinfo=dt.timezone.utc).timestamp()), int(end.replace(tzinfo=dt.timezone.utc).timestamp()))
+        return conn.execute(DATE_RANGE_SQL["typed"], params).fetchall()
+    return conn.execute(DATE_RANGE_SQL["text"], (day_key(start), day_key(end))).fetchall()
+
+def mongo_date_range(db, start, end, typed=False):
+    """Transactional model: invoice ids dated in [start, end)."""
+    if typed:
+        return list(db.invoices.find({"invoiceDate": {"$gte": start, "$lt": end}}, {"_id": 1}))
+    key = _mongo_day_key("$invoiceDate")
+    return list(db.invoices.find({"$expr": {"$and": [
+        {"$gte": [key, day_key(start)]}, {"$lt": [key, day_key(end)]}
+    ]}}, {"_id": 1}))
+
+def date_windows(n, seed, days=DATE_RANGE_DAYS):
+    """n reproducible [start, start + days) windows at day boundaries within the dataset's span."""
+    rng = random.Random(seed)
+    span = (LAST_DAY - FIRST_DAY).days - days
+    starts = [FIRST_DAY + dt.timedelta(days=rng.randrange(span)) for _ in range(n)]
+    return [(s, s + dt.timedelta(days=days)) for s in starts]
+
+# --- storage and memory ---------------------------------------------------------------
+
+def sqlite_storage(db_path):
+    """Bytes per table/index via dbstat (page_count * page_size if dbstat is not compiled in)."""
+    conn = sqlite3.connect(db_path)
+    try:
+        rows = conn.execute("SELECT name, SUM(pgsize) FROM dbstat GROUP BY name ORDER BY name").fetchall()
+    except sqlite3.OperationalError:
+        page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+        rows = [("(file)", conn.execute("PRAGMA page_count").fetchone()[0] * page_size)]
+    conn.close()
+    return {name: size for name, size in rows}
+
+def mongo_storage(db, collections=("customers", "products", "invoices", "invoice_items", "customers_cc")):
+    """collStats sizes per collection: data size, on-disk (compressed) size, indexes, average document."""
+    stats = {}
+    for name in collections:
+        s = db.command("collStats", name)
+        stats[name] = {
+            "count": s.get("count", 0),
+            "size": s.get("size", 0),
+            "storage_size": s.get("storageSize", 0),
+            "index_size": s.get("totalIndexSize", 0),
+            "avg_obj_size": s.get("avgObjSize", 0),
+        }
+    return stats
+
+def ingest_memory(nrows=None):
+    """
+    Frame memory (deep) of the cleaned dataset as the loaders see it (string ids
+    and dates) versus typed, plus the tracemalloc peak of building the
+    transactional Mongo documents from each.
+    """
+    text = dataset.load(columns=DOC_COLUMNS, nrows=nrows)
+    text["CustomerID"] = text["CustomerID"].astype(str)
+    typed = to_typed(dataset.load(columns=DOC_COLUMNS, nrows=nrows))
+    report = {}
+    for label, frame in (("text", text), ("typed", typed)):
+        tracemalloc.start()
+        build_transactional_bundles(frame)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        report[label] = {"frame_bytes": int(frame.memory_usage(deep=True).sum()), "documents_peak_bytes": peak}
+    return report
+
+def storage_report(client=None, text_db=DB_NAME, typed_db=TYPED_DB_NAME, nrows=None):
+    report = {
+        "sqlite": {"text": sqlite_storage(text_db), "typed": sqlite_storage(typed_db)},
+        "ingest_memory": ingest_memory(nrows),
+    }
+    if client is not None:
+        report["mongo"] = {"text": mongo_storage(client[MONGO_DB]), "typed": mongo_storage(client[TYPED_MONGO_DB])}
+    return report
+
+def print_storage_report(report):
+    for layout in ("text", "typed"):
+        sizes = report["sqlite"][layout]
+        print(f"SQLite {layout:<5}: {sum(sizes.values()) / 2**20:8.2f} MiB  " +
+              ", ".join(f"{name} {size / 2**10:,.0f}K" for name, size in sizes.items()))
+    for layout, stats in report.get("mongo", {}).items():
+        data = sum(s["size"] for s in stats.values())
+        disk = sum(s["storage_size"] + s["index_size"] for s in stats.values())
+        avg = {name: s["avg_obj_size"] for name, s in stats.items()}
+        print(f"Mongo  {layout:<5}: {data / 2**20:8.2f} MiB data, {disk / 2**20:8.2f} MiB on disk, avg doc bytes {avg}")
+    for layout, mem in report["ingest_memory"].items():
+        print(f"Ingest {layout:<5}: frame {mem['frame_bytes'] / 2**20:8.2f} MiB, "
+              f"document build peak {mem['documents_peak_bytes'] / 2**20:8.2f} MiB")
+
+if __name__ == "__main__":
+    import argparse
+    import json
+    from mongo_helpers import get_mongo_client
+    parser = argparse.ArgumentParser(description="Typed storage layout: load it and compare it with the string layout")
+    parser.add_argument("action", choices=["load-sqlite", "load-mongo", "report"])
+    parser.add_argument("--invoices", type=int, default=None, help="load-mongo: cap on invoices (default: all)")
+    parser.add_argument("--no-mongo", action="store_true", help="report: SQLite and memory only")
+    args = parser.parse_args()
+    if args.action == "load-sqlite":
+        load_sqlite()
+    elif args.action == "load-mongo":
+        client = get_mongo_client(os.environ.get("MONGO_URI"))
+        load_mongo(client, args.invoices)
+        client.close()
+    else:
+        client = None if args.no_mongo else get_mongo_client(os.environ.get("MONGO_URI"))
+        report = storage_report(client)
+        print_storage_report(report)
+        with open("storage_report.json", "w") as f:
+            json.dump(report, f, indent=4)
+        if client is not None:
+            client.close()